@@ -16,3 +16,8 @@ class PluginNameConfig(AppConfig):
         from .decoders import Toa5Decoder, SiapMicrosDecoder
         ftp_decoder_registry.register(Toa5Decoder())
         ftp_decoder_registry.register(SiapMicrosDecoder())
+        
+        # third-party decoders are only imported when first used
+        ftp_decoder_registry.discover_entry_points()
+        
+        from . import signals  # noqa: F401
@@ -0,0 +1,164 @@
+import bz2
+import gzip
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+ZIP_MAGIC = b"PK\x03\x04"
+
+COMPRESSION_EXTENSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".zip": "zip",
+}
+
+
+def detect_compression(file_path):
+    """
+    Detects the compression of the given file from its magic bytes, falling back
+    to the file extension for files too short to carry a signature.
+    
+    :param str file_path: The path to the file.
+    :return: One of ``gzip``, ``bz2`` or ``zip``, or None if the file is not compressed.
+    :rtype: str | None
+    """
+    
+    with open(file_path, "rb") as f:
+        magic = f.read(len(ZIP_MAGIC))
+    
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    
+    if magic.startswith(BZIP2_MAGIC):
+        return "bz2"
+    
+    if magic.startswith(ZIP_MAGIC):
+        return "zip"
+    
+    if len(magic) < len(ZIP_MAGIC):
+        extension = os.path.splitext(file_path)[1].lower()
+        return COMPRESSION_EXTENSIONS.get(extension)
+    
+    return None
+
+
+def list_archive_members(file_path):
+    """
+    Returns the names of the files contained in a zip archive, skipping directories.
+    
+    :param str file_path: The path to the zip archive.
+    :return: The member names.
+    :rtype: list[str]
+    """
+    
+    with zipfile.ZipFile(file_path) as archive:
+        return [info.filename for info in archive.infolist() if not info.is_dir()]
+
+
+@contextmanager
+def open_binary_file(file_path):
+    """
+    Opens a gzip, bzip2 or uncompressed file as a binary stream of its
+    decompressed content.
+    
+    :param str file_path: The path to the file.
+    :return: The binary stream.
+    :rtype: typing.BinaryIO
+    """
+    
+    compression = detect_compression(file_path)
+    
+    if compression == "zip":
+        raise ValueError("Zip archives must be opened with open_data_file")
+    
+    if compression == "gzip":
+        opener = gzip.open
+    elif compression == "bz2":
+        opener = bz2.open
+    else:
+        opener = open
+    
+    with opener(file_path, "rb") as f:
+        yield f
+
+
+@contextmanager
+def open_data_file(file_path, member=None, encoding="UTF-8"):
+    """
+    Opens a data file as a text stream, transparently decompressing gzip and bzip2
+    files and reading the given member of zip archives. Content is decompressed
+    while it is read, so the file is never fully expanded in memory or on disk.
+    
+    :param str file_path: The path to the file.
+    :param str member: The zip archive member to read. May be omitted for
+        archives containing a single file.
+    :param str encoding: The text encoding of the file.
+    :return: The text stream.
+    :rtype: typing.TextIO
+    """
+    
+    if detect_compression(file_path) == "zip":
+        with zipfile.ZipFile(file_path) as archive:
+            if member is None:
+                members = [info.filename for info in archive.infolist() if not info.is_dir()]
+                if len(members) != 1:
+                    raise ValueError(f"Expected a single file in archive, found {len(members)}. "
+                                     f"The archive member to read must be given.")
+                member = members[0]
+            
+            with archive.open(member) as raw:
+                yield io.TextIOWrapper(raw, encoding=encoding)
+    else:
+        with open_binary_file(file_path) as raw:
+            yield io.TextIOWrapper(raw, encoding=encoding)
+
+
+def read_header(file_path, member=None, size=512):
+    """
+    Returns the first bytes of the decompressed content of a data file.
+    
+    :param str file_path: The path to the file.
+    :param str member: The zip archive member to read.
+    :param int size: The number of bytes to read.
+    :return: The header bytes.
+    :rtype: bytes
+    """
+    
+    with open_data_file(file_path, member) as f:
+        return f.buffer.read(size)
+
+
+def get_data_size(file_path, member=None):
+    """
+    Returns the size of the decompressed content of a data file, when it can be known
+    without decompressing it. The size of gzip files is read from their trailer, which
+    holds it modulo 4 GiB.
+    
+    :param str file_path: The path to the file.
+    :param str member: The zip archive member.
+    :return: The size in bytes, or None for bzip2 files and unknown zip members.
+    :rtype: int | None
+    """
+    
+    compression = detect_compression(file_path)
+    
+    if compression == "zip":
+        with zipfile.ZipFile(file_path) as archive:
+            infos = [info for info in archive.infolist() if not info.is_dir()]
+            if member is not None:
+                infos = [info for info in infos if info.filename == member]
+            return infos[0].file_size if len(infos) == 1 else None
+    
+    if compression == "gzip":
+        with open(file_path, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            return int.from_bytes(f.read(4), "little")
+    
+    if compression == "bz2":
+        return None
+    
+    return os.path.getsize(file_path)
@@ -0,0 +1,184 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone as dj_timezone
+
+from .models import NetworkFTP, FTPStationLink, FTPWorkItem
+from .path_templates import get_path_template, get_template_granularity
+from .utils import get_dates_to_now, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Celery queue the backfill tasks are sent to, so that they can be consumed by
+# dedicated low priority workers
+DEFAULT_BACKFILL_QUEUE = "adl_ftp_backfill"
+
+# A queued or running backfill without progress for this long is considered lost
+# and is queued again
+BACKFILL_STALE_AFTER = timedelta(hours=6)
+
+# A failed backfill is queued again once this long has passed since it failed
+BACKFILL_RETRY_AFTER = timedelta(hours=1)
+
+
+def needs_backfill(station_link):
+    """
+    Checks whether historical data from the start date of the station link still has to
+    be collected.
+    
+    :param FTPStationLink station_link: The station link.
+    :rtype: bool
+    """
+    if not (station_link.start_date and get_template_granularity(get_path_template(station_link))):
+        return False
+    
+    if station_link.backfill_start_date != station_link.start_date:
+        return True
+    
+    return station_link.backfill_status != FTPStationLink.BACKFILL_COMPLETED
+
+
+def is_backfill_active(station_link, now=None):
+    """
+    Checks whether a backfill of the station link is queued or running.
+    
+    :param FTPStationLink station_link: The station link.
+    :param datetime now: The current time.
+    :rtype: bool
+    """
+    if station_link.backfill_status not in (FTPStationLink.BACKFILL_QUEUED, FTPStationLink.BACKFILL_RUNNING):
+        return False
+    
+    now = now or dj_timezone.now()
+    
+    return bool(station_link.backfill_heartbeat) and station_link.backfill_heartbeat > now - BACKFILL_STALE_AFTER
+
+
+def is_backfill_retry_due(station_link, now=None):
+    """
+    Checks whether a failed backfill of the station link can be queued again, which
+    happens ``BACKFILL_RETRY_AFTER`` after it failed. Backfills that did not fail are
+    always due.
+    
+    :param FTPStationLink station_link: The station link.
+    :param datetime now: The current time.
+    :rtype: bool
+    """
+    if station_link.backfill_status != FTPStationLink.BACKFILL_FAILED or not station_link.backfill_heartbeat:
+        return True
+    
+    now = now or dj_timezone.now()
+    
+    return station_link.backfill_heartbeat <= now - BACKFILL_RETRY_AFTER
+
+
+def schedule_backfills(network_ftp):
+    """
+    Queues a backfill task for each station link of the network with historical data
+    left to collect.
+    
+    :param NetworkFTP network_ftp: The FTP network.
+    """
+    from .tasks import run_station_link_backfill
+    
+    queue = getattr(settings, "ADL_FTP_BACKFILL_QUEUE", DEFAULT_BACKFILL_QUEUE)
+    now = dj_timezone.now()
+    
+    for station_link in network_ftp.station_links.all():
+        if not needs_backfill(station_link) or is_backfill_active(station_link, now):
+            continue
+        
+        if not is_backfill_retry_due(station_link, now):
+            continue
+        
+        logger.info(f"[ADL_FTP_PLUGIN] Queueing backfill for station {station_link.station.name}")
+        
+        station_link.backfill_status = FTPStationLink.BACKFILL_QUEUED
+        station_link.backfill_heartbeat = now
+        station_link.save(update_fields=["backfill_status", "backfill_heartbeat"])
+        
+        run_station_link_backfill.apply_async(args=[station_link.pk], queue=queue)
+
+
+def run_backfill(station_link_id):
+    """
+    Collects the historical data of a station link, from its start date to now.
+    
+    The date range is processed in chunks of ``backfill_chunk_size`` date directories.
+    Progress is checkpointed after each chunk, so an interrupted backfill resumes where
+    it stopped. Downloads and observation writes are throttled to the limits of the
+    network.
+    
+    :param int station_link_id: The id of the station link.
+    """
+    from .collector import NetworkCollector
+    
+    station_link = FTPStationLink.objects.get(pk=station_link_id)
+    network_ftp = NetworkFTP.objects.get(pk=station_link.network_connection_id)
+    
+    if not needs_backfill(station_link):
+        return
+    
+    # restart from the start date if it changed since the last backfill
+    if station_link.backfill_start_date != station_link.start_date or not station_link.backfill_checkpoint:
+        station_link.backfill_start_date = station_link.start_date
+        station_link.backfill_checkpoint = station_link.start_date
+    
+    collector = NetworkCollector(network_ftp)
+    if not collector.setup():
+        return
+    
+    # realtime files are processed before historical ones
+    collector.work_priority = FTPWorkItem.PRIORITY_BACKFILL
+    # realtime runs have already ingested past the historical dates
+    collector.use_ingestion_cutoff = False
+    
+    if network_ftp.backfill_max_records_per_second:
+        collector.write_rate_limiter = RateLimiter(network_ftp.backfill_max_records_per_second)
+    
+    # backfills are held to the stricter of the network and backfill bandwidth limits
+    bandwidth_limits = [limit for limit in (network_ftp.max_bytes_per_second,
+                                            network_ftp.backfill_max_bytes_per_second) if limit]
+    bandwidth_limiter = RateLimiter(min(bandwidth_limits)) if bandwidth_limits else None
+    
+    update_fields = ["backfill_status", "backfill_start_date", "backfill_checkpoint", "backfill_heartbeat"]
+    
+    station_link.backfill_status = FTPStationLink.BACKFILL_RUNNING
+    station_link.backfill_heartbeat = dj_timezone.now()
+    station_link.save(update_fields=update_fields)
+    
+    logger.info(f"[ADL_FTP_PLUGIN] Backfilling station {station_link.station.name} "
+                f"from {station_link.backfill_checkpoint}")
+    
+    try:
+        collector.ftp = collector.connect(network_ftp, rate_limiter=bandwidth_limiter)
+        
+        template = get_path_template(station_link)
+        date_granularity = get_template_granularity(template)
+        dates = get_dates_to_now(date_granularity, station_link.timezone, station_link.backfill_checkpoint)
+        chunk_size = max(network_ftp.backfill_chunk_size, 1)
+        
+        for i in range(0, len(dates), chunk_size):
+            chunk_dates = dates[i:i + chunk_size]
+            paths = collector.find_date_paths(station_link, template, chunk_dates)
+            
+            collector.process_paths(station_link, paths)
+            collector.process_work_queue(station_link=station_link)
+            
+            next_dates = dates[i + chunk_size:i + chunk_size + 1]
+            station_link.backfill_checkpoint = next_dates[0] if next_dates else chunk_dates[-1]
+            station_link.backfill_heartbeat = dj_timezone.now()
+            station_link.save(update_fields=update_fields)
+        
+        station_link.backfill_status = FTPStationLink.BACKFILL_COMPLETED
+        logger.info(f"[ADL_FTP_PLUGIN] Backfill completed for station {station_link.station.name}")
+    except Exception:
+        station_link.backfill_status = FTPStationLink.BACKFILL_FAILED
+        # the backfill is retried once BACKFILL_RETRY_AFTER has passed since it failed
+        station_link.backfill_heartbeat = dj_timezone.now()
+        raise
+    finally:
+        station_link.save(update_fields=update_fields)
+        if collector.ftp is not None:
+            collector.ftp.close()
@@ -0,0 +1,1036 @@
+import fnmatch
+import hashlib
+import logging
+import posixpath
+import tempfile
+import time
+import zipfile
+from contextlib import nullcontext
+from ftplib import error_perm
+
+from adl.core.models import ObservationRecord
+from dateutil.relativedelta import relativedelta
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone as dj_timezone
+
+from .archives import detect_compression, get_data_size, list_archive_members, open_data_file, read_header
+from .backfill import schedule_backfills
+from .dedupe import get_observation_cache
+from .ftp import FTPClient, DEFAULT_COMMAND_RATE
+from .ftp.prefetch import PrefetchingDownloader
+from .ingest import IngestBatch, INGEST_BATCH_SIZE
+from .models import FTPStationDataFile, FTPWorkItem
+from .path_templates import (
+    PathTemplateCrawler,
+    get_path_template,
+    get_template_granularity,
+    render_path_template
+)
+from .profiling import RunProfiler
+from .registries import ftp_decoder_registry, AUTO_DETECT_DECODER
+from .scheduling import is_poll_due, schedule_next_poll
+from .spool import RecordSpool
+from .storage import apply_storage_policy, compress_data_file
+from .utils import (
+    normalize_path,
+    get_dates_to_now,
+    get_mapping_plan_hash,
+    get_observation_unique_fields,
+    get_memory_usage,
+    get_peak_memory_usage,
+    FilePatternIndex,
+    RateLimiter
+)
+from .work_queue import enqueue_data_files, claim_work_items, finish_work_item, prune_work_items
+
+logger = logging.getLogger(__name__)
+
+# Number of failed processing attempts after which a file is quarantined
+MAX_FILE_PROCESSING_ATTEMPTS = 3
+
+# Number of row errors kept as a sample on the data file
+ERROR_SAMPLE_SIZE = 5
+
+
+class NetworkCollector:
+    """
+    Collects and processes the data files of one FTP network.
+    
+    A collector holds the state of a single run, so that several networks can be
+    collected concurrently in the same process, each with its own collector.
+    """
+    
+    def __init__(self, network_ftp, max_sessions=None):
+        """
+        :param NetworkFTP network_ftp: The FTP network.
+        :param int max_sessions: The maximum number of FTP sessions the run opens at
+            once.
+        """
+        self.network_ftp = network_ftp
+        self.max_sessions = max_sessions
+        self.decoder = None
+        self.ftp = None
+        self.variable_mappings = None
+        self.mapping_plan_hash = None
+        self.write_rate_limiter = None
+        self.work_priority = FTPWorkItem.PRIORITY_REALTIME
+        # drop observations already saved before writing them
+        self.deduplicate_observations = True
+        # skip the rows older than what has already been ingested
+        self.use_ingestion_cutoff = True
+        # replace the value of observations already saved, instead of keeping it
+        self.overwrite_observations = False
+        # times the stages of the run while it is profiled
+        self.stage_timer = None
+    
+    def setup(self):
+        """
+        Resolves the decoder and variable mappings of the network for this run.
+        
+        :return: False if the network can not be processed.
+        :rtype: bool
+        """
+        network_ftp = self.network_ftp
+        decoder_name = network_ftp.decoder
+        
+        if decoder_name == AUTO_DETECT_DECODER:
+            # the decoder is detected for each station link from its files
+            self.decoder = None
+        else:
+            decoder = ftp_decoder_registry.get(decoder_name)
+            
+            if not decoder:
+                logger.error(f"[ADL_FTP_PLUGIN] Decoder {decoder_name} not found in decoder registry.")
+                return False
+            
+            # found decoder
+            self.decoder = decoder
+        
+        variable_mappings = network_ftp.variable_mappings.all()
+        
+        if not variable_mappings:
+            logger.warning(
+                f"[ADL_FTP_PLUGIN] No variable mappings found for network {network_ftp.network.name}. Skipping...")
+            return False
+        
+        self.variable_mappings = variable_mappings
+        self.mapping_plan_hash = get_mapping_plan_hash(variable_mappings)
+        
+        return True
+    
+    @staticmethod
+    def connect(network_ftp, rate_limiter=None, command_rate_limiter=None):
+        """
+        Opens an FTP session with the server of the network. Rate limiters not given are
+        created from the bandwidth and command limits of the network. Pass the limiters
+        of an existing session to shape several sessions together. Sessions always have
+        a command limiter, so that they can be slowed down when the server asks to.
+        """
+        if rate_limiter is None and network_ftp.max_bytes_per_second:
+            rate_limiter = RateLimiter(network_ftp.max_bytes_per_second)
+        
+        if command_rate_limiter is None:
+            command_rate_limiter = RateLimiter(network_ftp.max_commands_per_second or DEFAULT_COMMAND_RATE)
+        
+        return FTPClient(host=network_ftp.host, port=network_ftp.port, user=network_ftp.username,
+                         password=network_ftp.password, rate_limiter=rate_limiter,
+                         command_rate_limiter=command_rate_limiter)
+    
+    def connect_session(self):
+        """
+        Opens an additional FTP session, shaped together with the main session of the
+        run.
+        """
+        return self.connect(self.network_ftp, rate_limiter=self.ftp.rate_limiter,
+                            command_rate_limiter=self.ftp.command_rate_limiter)
+    
+    def get_parallelism(self, workers):
+        """
+        Returns the number of parallel sessions to use for the given setting of the
+        network, within the session budget of the run. The main session is always open,
+        so ``workers`` above 1 are additional sessions.
+        """
+        if self.max_sessions:
+            workers = min(workers, max(self.max_sessions - 1, 1))
+        
+        return workers
+    
+    def run(self):
+        """
+        Collects the new files of the due station links of the network and processes
+        them.
+        """
+        network_ftp = self.network_ftp
+        
+        logger.info(f"[ADL_FTP_PLUGIN] Getting data from FTP network {network_ftp.network.name}")
+        
+        # Create FTP client
+        self.ftp = self.connect(network_ftp)
+        
+        try:
+            station_links = [station_link for station_link in network_ftp.station_links.all()
+                             if self.is_station_link_due(station_link)]
+            
+            # station links to profile are collected on their own, so that their profile
+            # only covers them
+            collected_station_links = [station_link for station_link in station_links
+                                       if not station_link.profile_next_run]
+            
+            paths_by_station_link = {}
+            for station_link in collected_station_links:
+                logger.info(f"[ADL_FTP_PLUGIN] Getting data for station {station_link.station.name}")
+                paths_by_station_link[station_link.pk] = self.get_station_link_paths(station_link)
+            
+            new_files_counts = self.process_network_paths(collected_station_links, paths_by_station_link)
+        finally:
+            # close the connection
+            self.ftp.close()
+        
+        for station_link in station_links:
+            if station_link.profile_next_run:
+                new_files_counts[station_link.pk] = self.profile_station_link(station_link)
+        
+        # process the downloaded files, including earlier files due for a retry
+        self.process_work_queue()
+        
+        for station_link in station_links:
+            if station_link.adaptive_polling:
+                schedule_next_poll(station_link, new_files_counts[station_link.pk])
+        
+        apply_storage_policy(network_ftp)
+        prune_work_items(network_ftp.pk)
+        
+        # historical data is collected separately, so that it does not delay the
+        # realtime data
+        schedule_backfills(network_ftp)
+    
+    def profile_station_link(self, station_link):
+        """
+        Collects and processes the new files of one station link, on its own FTP
+        session, while capturing a cProfile profile and the time spent in each stage of
+        the run. The profile is saved to storage, and the profiling flag of the station
+        link is cleared.
+        
+        :param FTPStationLink station_link: The station link.
+        :return: The number of newly downloaded files.
+        :rtype: int
+        """
+        logger.info(f"[ADL_FTP_PLUGIN] Profiling the run of station {station_link.station.name}")
+        
+        profiler = RunProfiler(station_link)
+        self.stage_timer = profiler.stage_timer
+        
+        new_files_count = 0
+        processed_count = 0
+        error = None
+        
+        try:
+            with profiler:
+                with self.stage("connect"):
+                    self.ftp = self.connect(self.network_ftp)
+                
+                try:
+                    paths = self.get_station_link_paths(station_link)
+                    new_files_count = self.process_paths(station_link, paths)
+                finally:
+                    self.ftp.close()
+                
+                processed_count = self.process_work_queue(station_link=station_link)
+        except Exception as e:
+            # the other station links of the network are still processed
+            logger.exception(f"[ADL_FTP_PLUGIN] Error in the profiled run of station {station_link.station.name}")
+            error = str(e)
+        
+        self.stage_timer = None
+        
+        try:
+            summary_path = profiler.save(new_files=new_files_count, processed_files=processed_count, error=error)
+        except Exception as e:
+            logger.error(f"[ADL_FTP_PLUGIN] Could not save the profile of station {station_link.station.name}: {e}")
+            summary_path = None
+        else:
+            logger.info(f"[ADL_FTP_PLUGIN] Saved the profile of station {station_link.station.name} "
+                        f"to {posixpath.dirname(summary_path)}")
+        
+        station_link.profile_next_run = False
+        station_link.last_profile_path = summary_path
+        station_link.save(update_fields=["profile_next_run", "last_profile_path"])
+        
+        return new_files_count
+    
+    def stage(self, name):
+        """
+        Times a stage of the run, when the run is profiled.
+        """
+        if self.stage_timer is None:
+            return nullcontext()
+        
+        return self.stage_timer.stage(name)
+    
+    @staticmethod
+    def is_station_link_due(station_link):
+        if not is_poll_due(station_link):
+            logger.info(f"[ADL_FTP_PLUGIN] Station {station_link.station.name} not due for polling "
+                        f"until {station_link.next_poll_at}. Skipping..")
+            return False
+        
+        return True
+    
+    def get_station_link_paths(self, station_link):
+        """
+        Returns the existing directories the station link is polled from.
+        
+        :rtype: list[str]
+        """
+        template = get_path_template(station_link)
+        date_granularity = get_template_granularity(template)
+        
+        # Find the date directories if the path is structured by date. Only the current
+        # and previous dates are collected here, the previous one for files uploaded
+        # late. Data from the start date is collected by the backfill
+        if date_granularity:
+            from_date = dj_timezone.now() - relativedelta(**{f"{date_granularity}s": 1})
+            dates = get_dates_to_now(date_granularity, station_link.timezone, from_date)
+            return self.find_date_paths(station_link, template, dates)
+        
+        path = render_path_template(template, station_link)
+        
+        # check if the path exists, from the listing of its parent directory
+        with self.stage("list"):
+            exists = self.ftp.exists(path)
+        
+        if not exists:
+            logger.warning(f"[ADL_FTP_PLUGIN] Path {path} not found")
+            return []
+        
+        return [path]
+    
+    def find_date_paths(self, station_link, template, dates):
+        """
+        Finds the existing directories of a path template for the given dates, listing
+        the date directories on up to ``max_parallel_listings`` FTP sessions.
+        
+        :return: The existing directories, in date order.
+        :rtype: list[str]
+        """
+        crawler = PathTemplateCrawler(self.ftp, client_factory=self.connect_session,
+                                      workers=self.get_parallelism(self.network_ftp.max_parallel_listings))
+        
+        try:
+            with self.stage("list"):
+                return crawler.crawl(template, dates, station_link)
+        finally:
+            crawler.close()
+    
+    def process_network_paths(self, station_links, paths_by_station_link):
+        """
+        Processes the files of several station links of the network. Each directory is
+        listed once, and its files are routed to the station links polling it by file
+        pattern, so that stations sharing a directory do not list it again.
+        
+        :param list[FTPStationLink] station_links: The station links.
+        :param dict[int, list[str]] paths_by_station_link: The paths of each station
+            link, by id.
+        :return: The number of newly downloaded files, by station link id.
+        :rtype: dict[int, int]
+        """
+        station_links_by_path = {}
+        for station_link in station_links:
+            for path in paths_by_station_link[station_link.pk]:
+                station_links_by_path.setdefault(path, []).append(station_link)
+        
+        new_files_counts = {station_link.pk: 0 for station_link in station_links}
+        
+        for path, path_station_links in station_links_by_path.items():
+            files = self.list_path(path)
+            
+            index = FilePatternIndex((station_link.file_pattern, station_link.pk)
+                                     for station_link in path_station_links)
+            
+            matching_files = {station_link.pk: [] for station_link in path_station_links}
+            for file in files:
+                for station_link_id in index.match(file["name"]):
+                    matching_files[station_link_id].append(file)
+            
+            for station_link in path_station_links:
+                new_files_counts[station_link.pk] += self.process_matching_files(station_link, path,
+                                                                                 matching_files[station_link.pk])
+        
+        return new_files_counts
+    
+    def process_paths(self, station_link, paths):
+        """
+        Downloads the files of the station link found in the given paths, and queues
+        them for processing.
+        
+        :return: The number of newly downloaded files.
+        :rtype: int
+        """
+        new_files_count = 0
+        
+        # Process each path
+        for path in paths:
+            new_files_count += self.process_path(station_link, path)
+        
+        return new_files_count
+    
+    def list_path(self, path):
+        """
+        Lists the files in the given path.
+        
+        :return: The files, or an empty list if the path can not be listed.
+        :rtype: list[dict]
+        """
+        logger.info(f"[ADL_FTP_PLUGIN] Getting list of files in path {path}")
+        try:
+            with self.stage("list"):
+                return self.ftp.list(path, extra=True)
+        except error_perm as e:
+            logger.warning(f"[ADL_FTP_PLUGIN] Path {path} could not be listed: {e}")
+            return []
+    
+    def process_path(self, station_link, path):
+        """
+        Downloads the files of the station link found in the given path, and queues them
+        for processing.
+        
+        :return: The number of newly downloaded files.
+        :rtype: int
+        """
+        files = self.list_path(path)
+        pattern = station_link.file_pattern
+        
+        # Filter files by pattern
+        matching_files = [file for file in files if fnmatch.fnmatch(file["name"], pattern)]
+        
+        return self.process_matching_files(station_link, path, matching_files)
+    
+    def process_matching_files(self, station_link, path, matching_files):
+        """
+        Downloads the files of the station link matching its file pattern in the given
+        path, and queues them for processing.
+        
+        :return: The number of newly downloaded files.
+        :rtype: int
+        """
+        station = station_link.station
+        pattern = station_link.file_pattern
+        new_files_count = 0
+        
+        # If no files found, log and continue
+        if not matching_files:
+            logger.info(f"[ADL_FTP_PLUGIN] No files found for station {station.name} matching "
+                        f"pattern {pattern} in path {path}")
+        else:
+            logger.info(
+                f"[ADL_FTP_PLUGIN] Found {len(matching_files)} matching files for station {station.name}")
+        
+        files_to_download = []
+        
+        for file in matching_files:
+            file_name = file["name"]
+            
+            # Check if this file was already downloaded. Archives have one data file
+            # per member
+            db_data_files = list(FTPStationDataFile.objects.filter(station_link=station_link,
+                                                                   file_name=file_name))
+            
+            if db_data_files and all(db_data_file.quarantined for db_data_file in db_data_files):
+                logger.warning(f"[ADL_FTP_PLUGIN] File {file_name} is quarantined. Skipping..")
+                continue
+            
+            if db_data_files and station_link.skip_already_downloaded_files:
+                logger.info(f"[ADL_FTP_PLUGIN] File {file_name} already downloaded")
+                self.queue_data_files(station_link, db_data_files)
+            else:
+                files_to_download.append(file)
+        
+        remote_files = {normalize_path(f"{path}/{file['name']}"): file for file in files_to_download}
+        
+        for remote_file_path, local_path, content_hash in self.download_files(remote_files.keys()):
+            file = remote_files[remote_file_path]
+            
+            remote_modified_at = file.get("datetime")
+            if remote_modified_at:
+                remote_modified_at = dj_timezone.make_aware(remote_modified_at, station_link.timezone)
+            
+            # the stored file is queued in the same transaction, so that it is never
+            # left out of the queue
+            with self.stage("store"), transaction.atomic():
+                db_data_files = self.store_file(station_link, file["name"], local_path, content_hash,
+                                                remote_modified_at)
+                self.queue_data_files(station_link, db_data_files)
+            
+            new_files_count += 1
+        
+        return new_files_count
+    
+    def queue_data_files(self, station_link, db_data_files):
+        """
+        Queues the data files that need processing in the work queue.
+        """
+        queued_data_files = []
+        
+        for db_data_file in db_data_files:
+            if db_data_file.quarantined:
+                logger.warning(f"[ADL_FTP_PLUGIN] File {db_data_file} is quarantined. Skipping..")
+                continue
+            
+            if db_data_file.processed and station_link.skip_already_processed_files:
+                logger.info(f"[ADL_FTP_PLUGIN] File {db_data_file} already processed. Skipping..")
+                continue
+            
+            if not db_data_file.file:
+                logger.info(f"[ADL_FTP_PLUGIN] File {db_data_file} has expired from storage. Skipping..")
+                continue
+            
+            queued_data_files.append(db_data_file)
+        
+        enqueue_data_files(queued_data_files, priority=self.work_priority)
+    
+    def process_work_queue(self, **filters):
+        """
+        Processes the queued data files of the network, until no item is available.
+        Items are claimed in batches, and the records, file state and item state of each
+        batch are committed together.
+        
+        :param filters: Filters on the work items, e.g. ``station_link=...``.
+        :return: The number of processed items.
+        :rtype: int
+        """
+        processed_count = 0
+        
+        while True:
+            with self.stage("claim"):
+                work_items = claim_work_items(INGEST_BATCH_SIZE,
+                                              station_link__network_connection_id=self.network_ftp.pk, **filters)
+            
+            if not work_items:
+                break
+            
+            with self.stage("commit"), IngestBatch(max_files=None) as batch:
+                for work_item in work_items:
+                    db_data_file = work_item.data_file
+                    
+                    logger.info(f"[ADL_FTP_PLUGIN] Processing file {db_data_file}")
+                    
+                    if db_data_file.file and not db_data_file.quarantined:
+                        self.process_file(db_data_file, work_item.station_link, self.variable_mappings, batch)
+                    
+                    finish_work_item(work_item, db_data_file)
+                    batch.add_work_item(work_item)
+            
+            processed_count += len(work_items)
+        
+        return processed_count
+    
+    def download_files(self, remote_file_paths):
+        """
+        Downloads the given files, yielding each one as soon as it is available. When
+        the network allows parallel downloads, the next files are downloaded on separate
+        FTP sessions while the current one is processed.
+        
+        :return: The remote path, temporary local path and content hash of each
+            downloaded file.
+        :rtype: collections.abc.Iterator[tuple[str, str, str]]
+        """
+        remote_file_paths = list(remote_file_paths)
+        workers = self.get_parallelism(self.network_ftp.max_parallel_downloads)
+        
+        if workers <= 1 or len(remote_file_paths) <= 1:
+            for remote_file_path in remote_file_paths:
+                hasher = hashlib.sha256()
+                
+                with tempfile.NamedTemporaryFile(suffix=posixpath.basename(remote_file_path)) as temp_file:
+                    logger.info(f"[ADL_FTP_PLUGIN] Downloading file {remote_file_path}..")
+                    try:
+                        with self.stage("download"):
+                            self.ftp.get(remote_file_path, temp_file.name, hasher=hasher)
+                    except RuntimeError as e:
+                        # interrupted transfer, skipped like on the prefetching path
+                        logger.error(f"[ADL_FTP_PLUGIN] Error downloading file {remote_file_path}: {e}")
+                        continue
+                    
+                    yield remote_file_path, temp_file.name, hasher.hexdigest()
+            return
+        
+        logger.info(f"[ADL_FTP_PLUGIN] Downloading {len(remote_file_paths)} files on {workers} sessions..")
+        
+        downloader = PrefetchingDownloader(self.connect_session, workers=workers)
+        
+        downloaded_files = downloader.download(remote_file_paths)
+        
+        try:
+            while True:
+                # time spent waiting for the next file, the downloads themselves run on
+                # other threads
+                with self.stage("download"):
+                    downloaded_file = next(downloaded_files, None)
+                
+                if downloaded_file is None:
+                    break
+                
+                if downloaded_file.error:
+                    logger.error(f"[ADL_FTP_PLUGIN] Error downloading file {downloaded_file.remote_path}: "
+                                 f"{downloaded_file.error}")
+                    continue
+                
+                yield downloaded_file.remote_path, downloaded_file.local_path, downloaded_file.content_hash
+        finally:
+            # drop the files fetched ahead before closing the sessions
+            downloaded_files.close()
+            downloader.close()
+    
+    def store_file(self, station_link, file_name, local_path, content_hash, remote_modified_at=None):
+        """
+        Stores a downloaded file. Zip archives are stored once, with a data file created
+        for each member so that members are tracked and processed separately. Files with
+        the same content as an already downloaded file are marked as processed.
+        
+        :return: The created data files.
+        :rtype: list[FTPStationDataFile]
+        """
+        db_data_files = []
+        stored_file_name = None
+        
+        originals = {}
+        for original in FTPStationDataFile.objects.filter(station_link=station_link,
+                                                          content_hash=content_hash).order_by("pk"):
+            originals.setdefault(original.archive_member, original)
+        
+        # earlier downloads of the same file, when already downloaded files are
+        # downloaded again
+        earlier_downloads = {}
+        for earlier_download in FTPStationDataFile.objects.filter(station_link=station_link,
+                                                                  file_name=file_name).order_by("pk"):
+            earlier_downloads[earlier_download.archive_member] = earlier_download
+        
+        if originals:
+            members = list(originals.keys())
+            logger.info(f"[ADL_FTP_PLUGIN] File {file_name} has the same content as already downloaded "
+                        f"file {next(iter(originals.values())).file_name}. Skipping decoding..")
+        else:
+            members = [None]
+            if detect_compression(local_path) == "zip":
+                try:
+                    members = list_archive_members(local_path) or [None]
+                    logger.info(f"[ADL_FTP_PLUGIN] File {file_name} is a zip archive with {len(members)} files")
+                except zipfile.BadZipFile as e:
+                    # truncated or still uploading. Stored as a single file, it fails
+                    # decoding and is retried, then quarantined, like any other
+                    # unreadable file
+                    logger.warning(f"[ADL_FTP_PLUGIN] File {file_name} is not a readable zip archive: {e}")
+        
+        for member in members:
+            original = originals.get(member)
+            
+            db_data_file = FTPStationDataFile(
+                station_link=station_link,  # Pass the appropriate FTPStationLink instance
+                file_name=file_name,
+                archive_member=member,
+                content_hash=content_hash,
+                remote_modified_at=remote_modified_at,
+            )
+            
+            # carry the failed attempts over, so that a failing file is quarantined even
+            # if it is downloaded again on every run
+            earlier_download = earlier_downloads.get(member)
+            if earlier_download and not earlier_download.processed:
+                db_data_file.processing_attempts = earlier_download.processing_attempts
+                db_data_file.quarantined = earlier_download.quarantined
+            
+            if original:
+                db_data_file.processed = True
+                db_data_file.quarantined = original.quarantined
+            
+            if original and self.network_ftp.deduplicate_storage:
+                # share the stored file of the original
+                db_data_file.file.name = original.file.name
+                db_data_file.save()
+            elif stored_file_name:
+                # archive members share the stored archive
+                db_data_file.file.name = stored_file_name
+                db_data_file.save()
+            else:
+                with open(local_path, "rb") as f:
+                    db_data_file.file.save(file_name, File(f))
+                stored_file_name = db_data_file.file.name
+            
+            db_data_files.append(db_data_file)
+        
+        return db_data_files
+    
+    def get_file_decoder(self, station_link, db_data_file):
+        """
+        Returns the decoder for the given data file. When the network decoder is set to
+        auto-detect, the decoder is detected from the file header and cached on the
+        station link for its file pattern, so that detection only runs once.
+        
+        :return: The decoder, or None if no decoder recognizes the file.
+        :rtype: FTPDecoder | None
+        """
+        if self.decoder:
+            return self.decoder
+        
+        signature = station_link.file_pattern
+        
+        if station_link.detected_decoder and station_link.detected_decoder_signature == signature:
+            decoder = ftp_decoder_registry.get(station_link.detected_decoder)
+            if decoder:
+                return decoder
+        
+        header_bytes = read_header(db_data_file.file.path, db_data_file.archive_member)
+        decoder = ftp_decoder_registry.detect(header_bytes)
+        
+        if decoder:
+            logger.info(f"[ADL_FTP_PLUGIN] Detected decoder {decoder.type} for station {station_link.station.name}")
+            station_link.detected_decoder = decoder.type
+            station_link.detected_decoder_signature = signature
+            station_link.save(update_fields=["detected_decoder", "detected_decoder_signature"])
+        
+        return decoder
+    
+    def process_file(self, db_data_file, station_link, variable_mappings, batch=None):
+        """
+        Decodes a data file and saves its observation records. The records are written
+        atomically with the processing state of the file. When a batch is given, the
+        state is saved with the batch, else it is saved right away.
+        
+        :param FTPStationDataFile db_data_file: The data file.
+        :param FTPStationLink station_link: The station link of the file.
+        :param variable_mappings: The variable mappings of the network.
+        :param IngestBatch batch: The batch committing the file.
+        """
+        station = station_link.station
+        
+        db_data_file.processing_attempts += 1
+        
+        # only parse the mapped variables
+        columns = {variable_mapping.file_variable_name for variable_mapping in variable_mappings}
+        columns.add("TIMESTAMP")
+        
+        # skip rows already ingested, when the file was processed before
+        since = self.get_ingestion_cutoff(db_data_file, station_link, variable_mappings)
+        
+        # files larger than the memory budget are decoded in chunks, with their records
+        # spooled to disk
+        memory_budget = (self.network_ftp.file_memory_budget or 0) * 1024 * 1024
+        data_size = None
+        if memory_budget:
+            try:
+                data_size = get_data_size(db_data_file.file.path, db_data_file.archive_member)
+            except Exception as e:
+                # unreadable files, e.g. truncated archives, fail decoding below and are
+                # recorded there
+                logger.warning(f"[ADL_FTP_PLUGIN] Could not read the size of file {db_data_file}: {e}")
+        streaming = bool(memory_budget) and (data_size is None or data_size > memory_budget)
+        
+        if streaming:
+            logger.info(f"[ADL_FTP_PLUGIN] File {db_data_file} exceeds the memory budget of "
+                        f"{self.network_ftp.file_memory_budget} MB. Decoding in chunks..")
+            obs_values = RecordSpool(memory_budget)
+        else:
+            obs_values = []
+        
+        decode_started_at = time.monotonic()
+        error_count = 0
+        error_sample = []
+        rows_ingested = 0
+        first_observation_time = None
+        last_observation_time = None
+        
+        try:
+            decoder = self.get_file_decoder(station_link, db_data_file)
+            if not decoder:
+                raise ValueError("No decoder recognizes the file format")
+            
+            with self.stage("decode"), open_data_file(db_data_file.file.path, db_data_file.archive_member) as f:
+                if not decoder.supports_decode_options():
+                    # decoders written for the original contract decode a whole file
+                    # from its path
+                    chunks = [decoder.decode_legacy(db_data_file.file.path, db_data_file.archive_member)]
+                elif streaming:
+                    chunks = decoder.iter_decode(f, tolerant=station_link.skip_invalid_rows, columns=columns,
+                                                 since=since)
+                else:
+                    chunks = [decoder.decode(f, tolerant=station_link.skip_invalid_rows, columns=columns,
+                                             since=since, compact=True)]
+                
+                for data in chunks:
+                    errors = data.get("errors", [])
+                    error_count += len(errors)
+                    error_sample.extend(errors[:ERROR_SAMPLE_SIZE - len(error_sample)])
+                    
+                    with self.stage("convert"):
+                        row_count, first_time, last_time = self.collect_obs_values(db_data_file, station_link,
+                                                                                   variable_mappings, data,
+                                                                                   obs_values)
+                    
+                    rows_ingested += row_count
+                    observation_times = [first_time, last_time] if row_count else []
+                    
+                    # rows skipped by the ingestion cutoff still belong to the time
+                    # range of the file
+                    skipped = data.get("skipped")
+                    if skipped and skipped.get("count"):
+                        observation_times += [dj_timezone.make_aware(skipped[key], station_link.timezone)
+                                              for key in ("first_time", "last_time")]
+                    
+                    for observation_time in observation_times:
+                        if first_observation_time is None or observation_time < first_observation_time:
+                            first_observation_time = observation_time
+                        if last_observation_time is None or observation_time > last_observation_time:
+                            last_observation_time = observation_time
+        except Exception as e:
+            logger.error(f"[ADL_FTP_PLUGIN] Error decoding file {db_data_file.file_name}: {e}")
+            
+            if streaming:
+                obs_values.close()
+            
+            db_data_file.processed = False
+            self.record_file_failure(db_data_file, e, batch)
+            return
+        
+        if error_count:
+            logger.warning(f"[ADL_FTP_PLUGIN] Skipped {error_count} invalid rows in file {db_data_file.file_name}")
+        
+        db_data_file.error_count = error_count
+        db_data_file.error_sample = "\n".join(
+            f"line {error.get('line')}: {error.get('error')}" for error in error_sample
+        ) or None
+        db_data_file.mapping_plan_hash = self.mapping_plan_hash
+        db_data_file.rows_ingested = rows_ingested
+        db_data_file.first_observation_time = first_observation_time
+        db_data_file.last_observation_time = last_observation_time
+        db_data_file.decode_duration = time.monotonic() - decode_started_at
+        
+        try:
+            # within a batch this is a savepoint, so that a failed write only rolls back
+            # this file
+            with transaction.atomic():
+                if obs_values:
+                    logger.info(f"[ADL_FTP_PLUGIN] Saving {len(obs_values)} parameter records for "
+                                f"station {station.name}")
+                    
+                    with self.stage("write"):
+                        if streaming:
+                            self.save_obs_values(station_link, obs_values.iter_batches())
+                        else:
+                            self.save_obs_values(station_link, [obs_values])
+                
+                # Mark the db data file as processed, even if some rows were skipped or
+                # no records were found, so that it is not decoded again on every run
+                db_data_file.processed = True
+                if batch is None:
+                    db_data_file.save()
+        except Exception as e:
+            logger.error(f"[ADL_FTP_PLUGIN] Error saving records of file {db_data_file.file_name}: {e}")
+            
+            db_data_file.processed = False
+            self.record_file_failure(db_data_file, e, batch)
+            return
+        finally:
+            if streaming:
+                obs_values.close()
+        
+        if batch is not None:
+            batch.add(db_data_file)
+        
+        memory = get_memory_usage()
+        if memory:
+            peak_memory = get_peak_memory_usage() or memory
+            logger.info(f"[ADL_FTP_PLUGIN] Worker memory after file {db_data_file}: {memory / (1024 * 1024):.1f} MB, "
+                        f"peak since the worker started: {peak_memory / (1024 * 1024):.1f} MB")
+        
+        # the stored file is only replaced once the records are committed
+        compression = self.network_ftp.archive_compression
+        transaction.on_commit(lambda: self.compress_stored_file(db_data_file, compression))
+    
+    @staticmethod
+    def compress_stored_file(db_data_file, compression):
+        """
+        Compresses the stored file of a processed data file. Errors are logged and the
+        file is left uncompressed, so that they do not abort the rest of the run.
+        """
+        try:
+            compress_data_file(db_data_file, compression)
+        except Exception as e:
+            logger.error(f"[ADL_FTP_PLUGIN] Error compressing file {db_data_file}: {e}")
+    
+    def get_ingestion_cutoff(self, db_data_file, station_link, variable_mappings):
+        """
+        Returns the time before which the rows of a data file can be skipped, when the
+        file was already processed before, like a growing file downloaded again or a
+        processed file queued again. Rows are skipped up to what was ingested for all
+        the mapped parameters, and from the earlier processing of the file. Files
+        processed for the first time are decoded in full, so that late and out of order
+        files keep all their rows.
+        
+        :return: The naive station local time, or None if no row can be skipped.
+        :rtype: datetime.datetime | None
+        """
+        if not self.use_ingestion_cutoff:
+            return None
+        
+        earlier_last_time = FTPStationDataFile.objects.filter(
+            station_link=station_link, file_name=db_data_file.file_name, archive_member=db_data_file.archive_member,
+            processed=True
+        ).aggregate(last_time=Max("last_observation_time"))["last_time"]
+        
+        if earlier_last_time is None:
+            return None
+        
+        cutoff = station_link.get_ingestion_cutoff(variable_mappings)
+        
+        if cutoff is None:
+            return None
+        
+        return min(cutoff, dj_timezone.make_naive(earlier_last_time, station_link.timezone))
+    
+    @staticmethod
+    def record_file_failure(db_data_file, error, batch=None):
+        """
+        Records a failed processing attempt of a data file, quarantining it after
+        ``MAX_FILE_PROCESSING_ATTEMPTS`` failures.
+        """
+        db_data_file.error_sample = str(error)
+        if db_data_file.processing_attempts >= MAX_FILE_PROCESSING_ATTEMPTS:
+            logger.warning(f"[ADL_FTP_PLUGIN] File {db_data_file.file_name} failed processing "
+                           f"{db_data_file.processing_attempts} times. Quarantining..")
+            db_data_file.quarantined = True
+        
+        if batch is not None:
+            batch.add(db_data_file)
+        else:
+            db_data_file.save()
+    
+    def collect_obs_values(self, db_data_file, station_link, variable_mappings, data, obs_values):
+        """
+        Converts the rows of a compact decode result to observation values, appended to
+        ``obs_values`` as ``(station_id, parameter_id, time, value, connection_id)``
+        tuples.
+        
+        :return: The number of rows with a timestamp, and the first and last of their
+            times.
+        :rtype: tuple[int, datetime | None, datetime | None]
+        """
+        timezone_info = station_link.timezone
+        station_id = station_link.station_id
+        connection_id = station_link.network_connection_id
+        
+        data_values = data.get("values")
+        
+        # rows are tuples ordered as the decoded columns. Resolve the position of
+        # the timestamp and of each mapped variable once for the whole chunk
+        column_positions = {column: i for i, column in enumerate(data.get("columns"))}
+        timestamp_position = column_positions.get("TIMESTAMP")
+        
+        mapping_positions = []
+        for variable_mapping in variable_mappings:
+            position = column_positions.get(variable_mapping.file_variable_name)
+            if position is None:
+                logger.info(f"[ADL_FTP_PLUGIN] Variable {variable_mapping.file_variable_name} not found "
+                            f"in file {db_data_file.file_name}")
+                continue
+            mapping_positions.append((variable_mapping, position))
+        
+        logger.info(f"[ADL_FTP_PLUGIN] Processing {len(data_values)} records")
+        
+        row_count = 0
+        first_time = None
+        last_time = None
+        
+        for record in data_values:
+            timestamp = record[timestamp_position] if timestamp_position is not None else None
+            
+            if not timestamp:
+                logger.warning(f"[ADL_FTP_PLUGIN] No timestamp found in record {record}")
+                continue
+            
+            utc_obs_date = dj_timezone.make_aware(timestamp, timezone_info)
+            
+            row_count += 1
+            if first_time is None or utc_obs_date < first_time:
+                first_time = utc_obs_date
+            if last_time is None or utc_obs_date > last_time:
+                last_time = utc_obs_date
+            
+            for variable_mapping, position in mapping_positions:
+                adl_parameter = variable_mapping.adl_parameter
+                file_variable_units = variable_mapping.file_variable_units
+                
+                value = record[position]
+                
+                if value is not None:
+                    try:
+                        value = adl_parameter.convert_value_units(value, file_variable_units)
+                        obs_values.append((station_id, adl_parameter.pk, utc_obs_date, value, connection_id))
+                    except Exception as e:
+                        logger.error(f"[ADL_FTP_PLUGIN] Error converting value for parameter "
+                                     f"{adl_parameter.parameter}: {e}")
+                else:
+                    logger.info(
+                        f"[ADL_FTP_PLUGIN] No data recorded for parameter {adl_parameter.parameter} ")
+        
+        return row_count, first_time, last_time
+    
+    def save_obs_values(self, station_link, batches):
+        """
+        Saves observation values, collected by ``collect_obs_values``, one batch at a
+        time. Values already saved according to the observation cache of the station
+        link are dropped.
+        
+        :param FTPStationLink station_link: The station link.
+        :param batches: The batches of observation values.
+        :type batches: iterable[list[tuple]]
+        """
+        cache = self.get_observation_cache(station_link)
+        dropped_count = 0
+        
+        for batch in batches:
+            if cache is not None:
+                new_values = cache.filter_new(batch)
+                dropped_count += len(batch) - len(new_values)
+                batch = new_values
+                
+                if not batch:
+                    continue
+            
+            obs_records = [
+                ObservationRecord(station_id=station_id, parameter_id=parameter_id, time=time, value=value,
+                                  connection_id=connection_id)
+                for station_id, parameter_id, time, value, connection_id in batch
+            ]
+            
+            if self.write_rate_limiter:
+                self.write_rate_limiter.consume(len(obs_records))
+            
+            if self.overwrite_observations:
+                ObservationRecord.objects.bulk_create(obs_records, update_conflicts=True, update_fields=["value"],
+                                                      unique_fields=get_observation_unique_fields())
+            else:
+                ObservationRecord.objects.bulk_create(obs_records, ignore_conflicts=True)
+            station_link.update_latest_observations(obs_records)
+            
+            if cache is not None:
+                cache.add_on_commit(batch)
+        
+        if dropped_count:
+            logger.info(f"[ADL_FTP_PLUGIN] Dropped {dropped_count} already saved records for "
+                        f"station {station_link.station.name}")
+    
+    def get_observation_cache(self, station_link):
+        """
+        Returns the observation cache of the station link, or None if deduplication is
+        disabled.
+        
+        :rtype: ObservationKeyCache | None
+        """
+        cache_size = self.network_ftp.observation_cache_size
+        
+        if not (self.deduplicate_observations and cache_size):
+            return None
+        
+        return get_observation_cache(station_link, cache_size)
@@ -1,8 +1,25 @@
+import os
+
+
 def setup(settings):
     """
     This function is called after adl has setup its own Django settings file but
     before Django starts. Read and modify provided settings object as appropriate
     just like you would in a normal Django settings file. E.g.:
-
+    
     settings.INSTALLED_APPS += ["some_custom_plugin_dep"]
     """
+    
+    # Celery queue consumed by the workers running historical data backfills
+    settings.ADL_FTP_BACKFILL_QUEUE = os.environ.get("ADL_FTP_BACKFILL_QUEUE", "adl_ftp_backfill")
+    
+    # Limits shared by the networks collected concurrently by the collect_ftp_networks
+    # task and command
+    settings.ADL_FTP_MAX_CONCURRENT_NETWORKS = int(os.environ.get("ADL_FTP_MAX_CONCURRENT_NETWORKS", 4))
+    settings.ADL_FTP_MAX_SESSIONS = int(os.environ.get("ADL_FTP_MAX_SESSIONS", 0)) or None
+    settings.ADL_FTP_MAX_DB_CONNECTIONS = int(os.environ.get("ADL_FTP_MAX_DB_CONNECTIONS", 0)) or None
+    
+    # Observation caches used to drop already saved rows, shared by the networks
+    # collected in a process
+    settings.ADL_FTP_OBSERVATION_CACHE_TTL = int(os.environ.get("ADL_FTP_OBSERVATION_CACHE_TTL", 3600))
+    settings.ADL_FTP_OBSERVATION_CACHE_MAX_KEYS = int(os.environ.get("ADL_FTP_OBSERVATION_CACHE_MAX_KEYS", 1000000))
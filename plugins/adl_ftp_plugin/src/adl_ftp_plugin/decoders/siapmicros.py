@@ -1,7 +1,9 @@
+import re
 from csv import reader as csv_reader
 from datetime import datetime
+from itertools import islice
 
-from ..registries import FTPDecoder
+from ..registries import FTPDecoder, SkippedRows, DECODE_CHUNK_SIZE
 
 VALUE_TYPES = {
     "A": "Instantaneous",
@@ -149,6 +151,10 @@ PARAMETER_LOOKUP = {
     },
 }
 
+# Leading fields of a line: station id, unknown, time, day, month, year, unknown and
+# number of blocks
+LEADING_FIELDS_PATTERN = re.compile(rb"[^,]*,[^,]*,\d{1,2}\.\d{1,2}\.\d{1,2},\d{1,2},\d{1,2},\d{4},[^,]*,M\d+,")
+
 
 class SiapMicrosDecoder(FTPDecoder):
     """
@@ -159,70 +165,257 @@ class SiapMicrosDecoder(FTPDecoder):
     compat_type = "siapmicros"
     display_name = "SIAP+Micros"
     
-    def decode(self, file_path):
+    def sniff(self, header_bytes):
+        lines = header_bytes.replace(b"\0", b"").split(b"\n")
+        
+        # the last line is cut off by the end of the header, unless it ends with one
+        complete_lines = [line.strip() for line in lines[:-1] if line.strip()]
+        
+        if not complete_lines:
+            # a line longer than the header has its check field cut off, so only its
+            # leading fields are checked
+            return bool(LEADING_FIELDS_PATTERN.match(lines[-1].strip()))
+        
+        fields = complete_lines[0].split(b",")
+        
+        # lines end with a '#' check field holding the number of fields
+        check_field = fields[-1]
+        return check_field.startswith(b"#") and check_field[1:].isdigit() and int(check_field[1:]) == len(fields)
+    
+    def decode(self, file_path, tolerant=False, columns=None, since=None, compact=False):
+        """
+        Decodes the given file and returns the result.
+        
+        :param file_path: The path to the file, or an open text file object, that
+            should be decoded.
+        :type file_path: str | typing.TextIO
+        :param tolerant: If True, skip and record invalid lines instead of raising.
+        :type tolerant: bool
+        :param columns: If provided, only the values of these parameter ids are parsed.
+        :type columns: set[str]
+        :param since: If provided, lines with an observation date older than this are
+            skipped.
+        :type since: datetime
+        :param compact: If True, lines are returned as tuples ordered as the ``columns``
+            list of the result, instead of dicts.
+        :type compact: bool
+        :return: The decoded data.
+        :rtype: dict
+        """
+        
         data = {
             "values": [],
+            "errors": [],
         }
-        with open(file_path, "r", encoding="UTF-8") as f_in:
+        skipped = SkippedRows()
+        
+        # shared schema of the compact rows. Without a projection, it grows as new
+        # parameter ids are found
+        schema = self.get_schema(columns)
+        positions = {column: i for i, column in enumerate(schema)}
+        
+        with self.open_file(file_path) as f_in:
             reader = csv_reader(line.replace('\0', '') for line in f_in)
             
-            for line in reader:
-                check_field = line[len(line) - 1]
-                if not check_field.startswith("#"):
-                    raise ValueError("The last field of the line should start with a '#' character.")
-                
-                # check count
-                count = int(check_field[1:])
-                if not len(line) == count:
-                    raise ValueError(
-                        "The count does not match the number of fields. Expected: {0}, Actual: {1}".format(count,
-                                                                                                           len(line)))
-                
-                # station id
-                station_id = line[0]
-                
-                # get dates
-                hh, mm, ss = line[2].split(".")
-                day = line[3]
-                month = line[4]
-                year = line[5]
-                
-                obs_date = f"{year}-{month}-{day} {hh}:{mm}:{ss}"
-                obs_date = datetime.strptime(obs_date, "%Y-%m-%d %H:%M:%S")
-                
-                # extract blocks of data
-                num_of_blocks = int(line[7].split("M")[1])
-                blocks_data = line[8:8 + num_of_blocks * 3]
+            for params_data in self.iter_lines(reader, tolerant, data.get("errors"), columns=columns, since=since,
+                                               skipped=skipped):
+                if compact:
+                    params_data = self.to_row(params_data, schema, positions)
                 
-                # split every 3 elements
-                blocks_units_data = [blocks_data[i:i + 3] for i in range(0, len(blocks_data), 3)]
+                data.get("values").append(params_data)
+        
+        if compact:
+            data["values"] = self.pad_rows(data.get("values"), len(schema))
+            data["columns"] = schema
+        
+        data["skipped"] = skipped.pop()
+        
+        return data
+    
+    def iter_decode(self, file_path, tolerant=False, columns=None, since=None, chunk_size=DECODE_CHUNK_SIZE):
+        """
+        Decodes the given file in chunks of lines, reading the file as the chunks are
+        consumed. Without a projection, later chunks can have more columns than earlier
+        ones.
+        
+        :param file_path: The path to the file, or an open text file object, that
+            should be decoded.
+        :type file_path: str | typing.TextIO
+        :param tolerant: If True, skip and record invalid lines instead of raising.
+        :type tolerant: bool
+        :param columns: If provided, only the values of these parameter ids are parsed.
+        :type columns: set[str]
+        :param since: If provided, lines with an observation date older than this are
+            skipped.
+        :type since: datetime
+        :param chunk_size: The maximum number of lines per chunk.
+        :type chunk_size: int
+        :return: The decoded chunks, with lines as tuples ordered as their ``columns``
+            list.
+        :rtype: collections.abc.Iterator[dict]
+        """
+        
+        schema = self.get_schema(columns)
+        positions = {column: i for i, column in enumerate(schema)}
+        errors = []
+        skipped = SkippedRows()
+        
+        with self.open_file(file_path) as f_in:
+            reader = csv_reader(line.replace('\0', '') for line in f_in)
+            lines = self.iter_lines(reader, tolerant, errors, columns=columns, since=since, skipped=skipped)
+            
+            while True:
+                values = [self.to_row(params_data, schema, positions) for params_data in islice(lines, chunk_size)]
+                chunk_errors = list(errors)
+                errors.clear()
                 
-                # check if the number of blocks is correct
-                if not len(blocks_units_data) == num_of_blocks:
-                    raise ValueError(
-                        f"The number of blocks data found :{len(blocks_units_data)} is not equal to the number of expected blocks: {num_of_blocks}")
+                if not values and not chunk_errors and not skipped.count:
+                    break
                 
-                params_data = {
-                    "station_id": station_id,
-                    "TIMESTAMP": obs_date,
+                yield {
+                    "values": self.pad_rows(values, len(schema)),
+                    "errors": chunk_errors,
+                    "columns": list(schema),
+                    "skipped": skipped.pop(),
                 }
+    
+    def iter_lines(self, reader, tolerant, errors, columns=None, since=None, skipped=None):
+        """
+        Parses the lines of the file as they are iterated. Invalid lines are appended
+        to ``errors`` when tolerant, else they raise. Lines skipped because of ``since``
+        are added to ``skipped``.
+        
+        :return: The parsed lines.
+        :rtype: collections.abc.Iterator[dict]
+        """
+        
+        for line in reader:
+            if not line:
+                continue
+            
+            try:
+                params_data = self.parse_line(line, columns=columns, since=since, skipped=skipped)
+            except (ValueError, IndexError) as e:
+                if not tolerant:
+                    raise
                 
-                for param_data in blocks_units_data:
-                    param_id = param_data[0]
-                    value_type = param_data[1]
-                    value = param_data[2]
-                    
-                    if not value_type in VALUE_TYPES:
-                        raise ValueError(f"Invalid value type: {value_type}")
-                    
-                    # convert the value to float
-                    try:
-                        value = float(value)
-                    except ValueError:
-                        value = None
-                    
-                    params_data[param_id] = value
-                
-                data.get("values").append(params_data)
+                errors.append({
+                    "line": reader.line_num,
+                    "error": str(e),
+                })
+                continue
+            
+            if params_data is None:
+                continue
+            
+            yield params_data
+    
+    @staticmethod
+    def get_schema(columns=None):
+        schema = ["station_id", "TIMESTAMP"]
+        if columns is not None:
+            schema += sorted(column for column in columns if column not in schema)
+        return schema
+    
+    @staticmethod
+    def to_row(params_data, schema, positions):
+        """
+        Converts a parsed line to a tuple ordered as the schema, adding the parameter
+        ids not yet in the schema.
+        """
+        for param_id in params_data:
+            if param_id not in positions:
+                positions[param_id] = len(schema)
+                schema.append(param_id)
         
-        return data
+        return tuple(params_data.get(column) for column in schema)
+    
+    @staticmethod
+    def pad_rows(rows, width):
+        # pad rows converted before the schema was complete
+        return [row if len(row) == width else row + (None,) * (width - len(row)) for row in rows]
+    
+    @staticmethod
+    def parse_line(line, columns=None, since=None, skipped=None):
+        """
+        Parses a single line and returns the result.
+        
+        :param line: The line fields.
+        :type line: list
+        :param columns: If provided, only the values of these parameter ids are parsed.
+        :type columns: set[str]
+        :param since: If provided, None is returned for lines with an observation date
+            older than this.
+        :type since: datetime
+        :param skipped: If provided, the line is added to it when skipped because of
+            ``since``.
+        :type skipped: SkippedRows
+        :return: The parsed line.
+        :rtype: dict | None
+        """
+        
+        check_field = line[len(line) - 1]
+        if not check_field.startswith("#"):
+            raise ValueError("The last field of the line should start with a '#' character.")
+        
+        # check count
+        count = int(check_field[1:])
+        if not len(line) == count:
+            raise ValueError(
+                "The count does not match the number of fields. Expected: {0}, Actual: {1}".format(count,
+                                                                                                   len(line)))
+        
+        # station id
+        station_id = line[0]
+        
+        # get dates
+        hh, mm, ss = line[2].split(".")
+        day = line[3]
+        month = line[4]
+        year = line[5]
+        
+        obs_date = f"{year}-{month}-{day} {hh}:{mm}:{ss}"
+        obs_date = datetime.strptime(obs_date, "%Y-%m-%d %H:%M:%S")
+        
+        if since is not None and obs_date < since:
+            if skipped is not None:
+                skipped.add(obs_date)
+            return None
+        
+        # extract blocks of data
+        num_of_blocks = int(line[7].split("M")[1])
+        blocks_data = line[8:8 + num_of_blocks * 3]
+        
+        # split every 3 elements
+        blocks_units_data = [blocks_data[i:i + 3] for i in range(0, len(blocks_data), 3)]
+        
+        # check if the number of blocks is correct
+        if not len(blocks_units_data) == num_of_blocks:
+            raise ValueError(
+                f"The number of blocks data found :{len(blocks_units_data)} is not equal to the number of expected blocks: {num_of_blocks}")
+        
+        params_data = {
+            "station_id": station_id,
+            "TIMESTAMP": obs_date,
+        }
+        
+        for param_data in blocks_units_data:
+            param_id = param_data[0]
+            value_type = param_data[1]
+            value = param_data[2]
+            
+            if not value_type in VALUE_TYPES:
+                raise ValueError(f"Invalid value type: {value_type}")
+            
+            if columns is not None and param_id not in columns:
+                continue
+            
+            # convert the value to float
+            try:
+                value = float(value)
+            except ValueError:
+                value = None
+            
+            params_data[param_id] = value
+        
+        return params_data
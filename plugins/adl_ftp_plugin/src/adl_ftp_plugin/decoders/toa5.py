@@ -1,7 +1,8 @@
 from csv import reader as csv_reader
 from datetime import datetime
+from itertools import islice
 
-from ..registries import FTPDecoder
+from ..registries import FTPDecoder, SkippedRows, DECODE_CHUNK_SIZE
 
 
 class Toa5Decoder(FTPDecoder):
@@ -13,58 +14,149 @@ class Toa5Decoder(FTPDecoder):
     compat_type = "campbell"
     display_name = "TOA5"
     
-    def decode(self, file_path):
+    def sniff(self, header_bytes):
+        header_bytes = header_bytes.lstrip(b"\xef\xbb\xbf")
+        return header_bytes.startswith(b'"TOA5"') or header_bytes.startswith(b"TOA5,")
+    
+    def decode(self, file_path, tolerant=False, columns=None, since=None, compact=False):
         """
         Decodes the given file and returns the result.
-
-        :param file_path: The file that should be decoded.
-        :type file_path: str
+        
+        :param file_path: The path to the file, or an open text file object, that
+            should be decoded.
+        :type file_path: str | typing.TextIO
+        :param tolerant: If True, skip and record invalid data rows instead of raising.
+        :type tolerant: bool
+        :param columns: If provided, only these columns are parsed.
+        :type columns: set[str]
+        :param since: If provided, rows with a timestamp older than this are skipped.
+        :type since: datetime
+        :param compact: If True, rows are returned as tuples ordered as the ``columns``
+            list of the result, instead of dicts.
+        :type compact: bool
         :return: The decoded data.
         :rtype: dict
         """
         
-        with open(file_path, "r", encoding="UTF-8") as f_in:
+        errors = [] if tolerant else None
+        
+        with self.open_file(file_path) as f_in:
             reader = csv_reader(line.replace('\0', '') for line in f_in)
             
-            # get header info
-            first_line = next(reader)
-            header_info = self.parse_header(first_line)
-            
-            # column names
-            column_names = next(reader)
+            header_info, column_names, metadata = self.read_header_rows(reader)
             
-            # units
-            units_list = next(reader)
-            # the number of columns and units should match
-            if not len(column_names) == len(units_list):
-                raise ValueError("The number of columns and units do not match.")
-            
-            processing_info_list = next(reader)
-            if not len(processing_info_list) == len(column_names):
-                raise ValueError("The number of processing info fields and columns do not match.")
-            
-            metadata = {}
-            for i, column in enumerate(column_names):
-                metadata[column] = {
-                    "unit": units_list[i],
-                    "proc": processing_info_list[i],
-                }
-            
-            data_values = self.parse_data(column_names, reader)
+            skipped = SkippedRows()
+            data_values = self.parse_data(column_names, reader, errors=errors, columns=columns,
+                                          since=since, compact=compact, skipped=skipped)
         
         data = {
             "header": header_info,
             "metadata": metadata,
             "values": data_values,
+            "errors": errors or [],
+            "skipped": skipped.pop(),
         }
         
+        if compact:
+            data["columns"] = [column for i, column in self.select_columns(column_names, columns)]
+        
         return data
     
+    def iter_decode(self, file_path, tolerant=False, columns=None, since=None, chunk_size=DECODE_CHUNK_SIZE):
+        """
+        Decodes the given file in chunks of rows, reading the file as the chunks are
+        consumed.
+        
+        :param file_path: The path to the file, or an open text file object, that
+            should be decoded.
+        :type file_path: str | typing.TextIO
+        :param tolerant: If True, skip and record invalid data rows instead of raising.
+        :type tolerant: bool
+        :param columns: If provided, only these columns are parsed.
+        :type columns: set[str]
+        :param since: If provided, rows with a timestamp older than this are skipped.
+        :type since: datetime
+        :param chunk_size: The maximum number of rows per chunk.
+        :type chunk_size: int
+        :return: The decoded chunks, with rows as tuples ordered as their ``columns``
+            list.
+        :rtype: collections.abc.Iterator[dict]
+        """
+        
+        errors = [] if tolerant else None
+        
+        with self.open_file(file_path) as f_in:
+            reader = csv_reader(line.replace('\0', '') for line in f_in)
+            
+            header_info, column_names, metadata = self.read_header_rows(reader)
+            chunk_columns = [column for i, column in self.select_columns(column_names, columns)]
+            
+            skipped = SkippedRows()
+            rows = self.iter_data(column_names, reader, errors=errors, columns=columns, since=since, compact=True,
+                                  skipped=skipped)
+            
+            while True:
+                data_values = list(islice(rows, chunk_size))
+                chunk_errors = list(errors or [])
+                
+                if not data_values and not chunk_errors and not skipped.count:
+                    break
+                
+                if errors:
+                    errors.clear()
+                
+                yield {
+                    "header": header_info,
+                    "metadata": metadata,
+                    "values": data_values,
+                    "errors": chunk_errors,
+                    "columns": chunk_columns,
+                    "skipped": skipped.pop(),
+                }
+    
+    @staticmethod
+    def read_header_rows(reader):
+        """
+        Reads the four header rows of the file and returns the header info, the column
+        names and the unit and processing metadata of each column.
+        
+        :param reader: The csv reader, positioned at the start of the file.
+        :type reader: iterator[list]
+        :return: The header info, column names and column metadata.
+        :rtype: tuple[dict, list, dict]
+        """
+        
+        # get header info
+        first_line = next(reader)
+        header_info = Toa5Decoder.parse_header(first_line)
+        
+        # column names
+        column_names = next(reader)
+        
+        # units
+        units_list = next(reader)
+        # the number of columns and units should match
+        if not len(column_names) == len(units_list):
+            raise ValueError("The number of columns and units do not match.")
+        
+        processing_info_list = next(reader)
+        if not len(processing_info_list) == len(column_names):
+            raise ValueError("The number of processing info fields and columns do not match.")
+        
+        metadata = {}
+        for i, column in enumerate(column_names):
+            metadata[column] = {
+                "unit": units_list[i],
+                "proc": processing_info_list[i],
+            }
+        
+        return header_info, column_names, metadata
+    
     @staticmethod
     def parse_header(first_line):
         """
         Parses the first line of the file and returns the result.
-
+        
         :param first_line: The first line of the file.
         :type first_line: list
         :return: The parsed data.
@@ -91,35 +183,147 @@ class Toa5Decoder(FTPDecoder):
         return header_info
     
     @staticmethod
-    def parse_data(column_names, data_lines):
+    def select_columns(column_names, columns=None):
+        """
+        Returns the positions and names of the columns to parse, with the timestamp
+        first so that old lines can be skipped before converting any value.
+        
+        :param column_names: The column names.
+        :type column_names: list
+        
+        :param columns: If provided, only these columns are selected.
+        :type columns: set[str]
+        
+        :return: The selected columns.
+        :rtype: list[tuple[int, str]]
+        """
+        
+        selected_columns = [(i, column) for i, column in enumerate(column_names)
+                            if columns is None or column in columns]
+        selected_columns.sort(key=lambda selected_column: selected_column[1] != "TIMESTAMP")
+        
+        return selected_columns
+    
+    @staticmethod
+    def parse_data(column_names, data_lines, errors=None, columns=None, since=None, compact=False, skipped=None):
         """
         Parses the data lines and returns the result.
-
+        
         :param column_names: The column names.
         :type column_names: list
         
         :param data_lines: The data lines.
         :type data_lines: iterable
         
+        :param errors: If provided, invalid lines are skipped and an error entry
+            is appended to this list instead of raising.
+        :type errors: list
+        
+        :param columns: If provided, only these columns are parsed.
+        :type columns: set[str]
+        
+        :param since: If provided, lines with a timestamp older than this are skipped.
+        :type since: datetime
+        
+        :param compact: If True, lines are returned as tuples ordered as the selected
+            columns.
+        :type compact: bool
+        
+        :param skipped: If provided, the lines skipped because of ``since`` are added to
+            it.
+        :type skipped: SkippedRows
+        
         :return: The parsed data.
         :rtype: list
         """
         
-        data = []
+        return list(Toa5Decoder.iter_data(column_names, data_lines, errors=errors, columns=columns,
+                                          since=since, compact=compact, skipped=skipped))
+    
+    @staticmethod
+    def iter_data(column_names, data_lines, errors=None, columns=None, since=None, compact=False, skipped=None):
+        """
+        Parses the data lines as they are iterated. See ``parse_data`` for the
+        parameters.
+        
+        :return: The parsed lines.
+        :rtype: collections.abc.Iterator[dict | tuple]
+        """
+        
+        # resolve the positions of the columns to parse once, instead of for every line
+        selected_columns = Toa5Decoder.select_columns(column_names, columns)
         
         for line in data_lines:
-            line_data = {}
+            if not line:
+                continue
             
-            for i, column in enumerate(column_names):
-                val = line[i]
-                if not val:
-                    continue
+            try:
+                if len(line) < len(column_names):
+                    raise ValueError(f"Expected {len(column_names)} fields, found {len(line)}")
+                
+                line_data = Toa5Decoder.parse_line(selected_columns, line, since=since, compact=compact,
+                                                   skipped=skipped)
+            except (ValueError, IndexError) as e:
+                if errors is None:
+                    raise
                 
-                if column == 'TIMESTAMP':
-                    line_data[column] = datetime.strptime(val, "%Y-%m-%d %H:%M:%S")
-                else:
-                    line_data[column] = float(val)
+                errors.append({
+                    "line": getattr(data_lines, "line_num", None),
+                    "error": str(e),
+                })
+                continue
             
-            data.append(line_data)
+            if line_data is None:
+                continue
+            
+            yield line_data
+    
+    @staticmethod
+    def parse_line(selected_columns, line, since=None, compact=False, skipped=None):
+        """
+        Parses a single data line and returns the result.
         
-        return data
+        :param selected_columns: The positions and names of the columns to parse.
+        :type selected_columns: list[tuple[int, str]]
+        
+        :param line: The data line fields.
+        :type line: list
+        
+        :param since: If provided, None is returned for lines with a timestamp older
+            than this.
+        :type since: datetime
+        
+        :param compact: If True, the line is returned as a tuple ordered as the selected
+            columns, with None for empty values.
+        :type compact: bool
+        
+        :param skipped: If provided, the line is added to it when skipped because of
+            ``since``.
+        :type skipped: SkippedRows
+        
+        :return: The parsed line.
+        :rtype: dict | tuple | None
+        """
+        
+        values = []
+        
+        for i, column in selected_columns:
+            val = line[i]
+            if not val:
+                values.append(None)
+                continue
+            
+            if column == 'TIMESTAMP':
+                timestamp = datetime.strptime(val, "%Y-%m-%d %H:%M:%S")
+                if since is not None and timestamp < since:
+                    if skipped is not None:
+                        skipped.add(timestamp)
+                    return None
+                values.append(timestamp)
+            else:
+                values.append(float(val))
+        
+        if compact:
+            return tuple(values)
+        
+        return {column: value for (i, column), value in zip(selected_columns, values) if value is not None}
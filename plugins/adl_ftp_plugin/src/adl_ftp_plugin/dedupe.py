@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from adl.core.models import ObservationRecord
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone as dj_timezone
+
+logger = logging.getLogger(__name__)
+
+# Window of recent observations a station link cache is warmed with when it is created
+OBSERVATION_CACHE_WARM_WINDOW = timedelta(days=2)
+
+# Caches older than this number of seconds are warmed again from the database, so that
+# observations deleted by other processes are eventually written again
+OBSERVATION_CACHE_TTL = 60 * 60
+
+# Maximum number of keys held by all the caches of a process
+OBSERVATION_CACHE_MAX_KEYS = 1000000
+
+
+class ObservationKeyCache:
+    """
+    Bounded LRU set of the ``(station_id, parameter_id, time)`` keys of observations
+    known to be saved, used to drop the duplicate rows of overlapping files before they
+    reach the database.
+    
+    Keys are only added once the transaction writing them commits, so a rolled back
+    write is never mistaken for a saved one. A key missing from the cache only costs
+    a conflict ignored by the database.
+    """
+    
+    def __init__(self, max_size, station_id=None):
+        self.max_size = max_size
+        self.station_id = station_id
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+        self.created_at = time.monotonic()
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def __contains__(self, key):
+        with self.lock:
+            if key not in self.keys:
+                return False
+            self.keys.move_to_end(key)
+            return True
+    
+    def add_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.keys[key] = None
+                self.keys.move_to_end(key)
+            
+            while len(self.keys) > self.max_size:
+                self.keys.popitem(last=False)
+    
+    def filter_new(self, obs_values):
+        """
+        Drops the observation values whose key is in the cache, and the repeated keys of
+        the batch.
+        
+        :param list[tuple] obs_values: Observation values, as ``(station_id,
+            parameter_id, time, value, connection_id)`` tuples.
+        :return: The values to write.
+        :rtype: list[tuple]
+        """
+        new_values = []
+        batch_keys = set()
+        
+        for obs_value in obs_values:
+            key = obs_value[:3]
+            if key in batch_keys or key in self:
+                continue
+            batch_keys.add(key)
+            new_values.append(obs_value)
+        
+        return new_values
+    
+    def add_on_commit(self, obs_values):
+        """
+        Adds the keys of the given observation values once the current transaction
+        commits.
+        """
+        keys = [obs_value[:3] for obs_value in obs_values]
+        transaction.on_commit(lambda: self.add_many(keys))
+    
+    def warm(self, station_link):
+        """
+        Loads the keys of the most recent observations of the station link, within
+        ``OBSERVATION_CACHE_WARM_WINDOW``.
+        
+        :param FTPStationLink station_link: The station link.
+        """
+        since = dj_timezone.now() - OBSERVATION_CACHE_WARM_WINDOW
+        station_id = station_link.station_id
+        
+        recent = ObservationRecord.objects.filter(station_id=station_id,
+                                                  connection_id=station_link.network_connection_id,
+                                                  time__gte=since).order_by("-time")
+        keys = [(station_id, parameter_id, time)
+                for parameter_id, time in recent.values_list("parameter_id", "time")[:self.max_size]]
+        
+        # oldest first, so that the most recent keys are the last to be evicted
+        keys.reverse()
+        self.add_many(keys)
+        
+        logger.info(f"[ADL_FTP_PLUGIN] Warmed observation cache of station {station_link.station.name} "
+                    f"with {len(keys)} keys")
+
+
+_caches = OrderedDict()
+_caches_lock = threading.Lock()
+
+
+def get_observation_cache(station_link, max_size):
+    """
+    Returns the observation key cache of a station link, shared by all collectors of
+    the process. The cache is created and warmed on first use, and created again when
+    its size changed or it is older than ``OBSERVATION_CACHE_TTL``, so that observations
+    deleted by other processes are forgotten. The caches of the least recently used
+    station links are dropped when all caches together hold more than
+    ``OBSERVATION_CACHE_MAX_KEYS`` keys.
+    
+    :param FTPStationLink station_link: The station link.
+    :param int max_size: The maximum number of keys kept.
+    :rtype: ObservationKeyCache
+    """
+    now = time.monotonic()
+    ttl = getattr(settings, "ADL_FTP_OBSERVATION_CACHE_TTL", OBSERVATION_CACHE_TTL)
+    max_size = min(max_size, get_max_keys())
+    
+    with _caches_lock:
+        cache = _caches.get(station_link.pk)
+        created = cache is None or cache.max_size != max_size or now - cache.created_at > ttl
+        
+        if created:
+            cache = ObservationKeyCache(max_size, station_id=station_link.station_id)
+            _caches[station_link.pk] = cache
+        
+        _caches.move_to_end(station_link.pk)
+    
+    if created:
+        cache.warm(station_link)
+        evict_observation_caches()
+    
+    return cache
+
+
+def evict_observation_caches():
+    """
+    Drops the caches of the least recently used station links, until all caches together
+    hold at most ``OBSERVATION_CACHE_MAX_KEYS`` keys. The most recently used cache is
+    kept.
+    """
+    max_keys = get_max_keys()
+    
+    with _caches_lock:
+        total = sum(len(cache) for cache in _caches.values())
+        
+        while total > max_keys and len(_caches) > 1:
+            _, cache = _caches.popitem(last=False)
+            total -= len(cache)
+
+
+def get_max_keys():
+    return getattr(settings, "ADL_FTP_OBSERVATION_CACHE_MAX_KEYS", OBSERVATION_CACHE_MAX_KEYS)
+
+
+def clear_observation_caches(station_link_ids=None, station_ids=None):
+    """
+    Forgets the cached keys of the given station links or stations, or of all of them.
+    Called when station links are deleted and when their files are re-ingested, as
+    their observations may have been deleted. Deletions made outside of the plugin are
+    only noticed once the caches expire.
+    
+    :param list[int] station_link_ids: The ids of the station links.
+    :param list[int] station_ids: The ids of the stations.
+    """
+    with _caches_lock:
+        if station_link_ids is None and station_ids is None:
+            _caches.clear()
+            return
+        
+        for station_link_id, cache in list(_caches.items()):
+            if station_link_id in (station_link_ids or ()) or cache.station_id in (station_ids or ()):
+                del _caches[station_link_id]
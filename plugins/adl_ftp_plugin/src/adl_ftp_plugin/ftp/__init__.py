@@ -1,27 +1,128 @@
-from ftplib import FTP, error_perm
+import logging
+import posixpath
+import random
+import time
+from ftplib import FTP, error_perm, error_temp
 from io import IOBase, BytesIO
 
 from .utils import split_file_info
 
+logger = logging.getLogger(__name__)
+
+# Number of times a command failing with a transient error (421, 425 or 426 reply, or
+# dropped connection) is retried
+MAX_COMMAND_RETRIES = 3
+
+# Transient replies: service not available, can not open or lost the data connection
+RETRY_REPLIES = ("421", "425", "426")
+
+# Commands per second of sessions without a command limit, lowered on transient errors
+DEFAULT_COMMAND_RATE = 50
+
+# Factor the command rate is lowered by on each transient error, and its lowest value
+COMMAND_THROTTLE_FACTOR = 0.5
+MIN_COMMAND_RATE = 0.5
+
+# Delay before the first retry, doubled with every retry and jittered
+COMMAND_RETRY_DELAY = 2.0
+
+# Replies to the listing of an empty or missing directory, e.g. "450 No files found"
+EMPTY_LISTING_REPLIES = ("450", "550")
+
 
 class FTPClient:
     """ FTP client """
     tmp_output = None
     relative_paths = {'.', '..'}
     
-    def __init__(self, host, port, user, password, secure=False, passive=True, ):
+    def __init__(self, host, port, user, password, secure=False, passive=True, rate_limiter=None,
+                 command_rate_limiter=None):
         self.host = host
         self.port = port
         self.user = user
         self.password = password
-        if port:
-            FTP.port = port
-        self.conn = FTP(host=host, user=user, passwd=password)
+        self.passive = passive
+        # optional RateLimiter for the downloaded bytes per second
+        self.rate_limiter = rate_limiter
+        # optional RateLimiter for the commands per second
+        self.command_rate_limiter = command_rate_limiter
+        # directory names listed during this session
+        self.names_cache = {}
+        self.conn = None
         
-        if not passive:
+        # connect, retrying transient errors
+        self._command(lambda: None)
+    
+    def connect(self):
+        """ Open a new session with the server """
+        self.conn = FTP()
+        self.conn.connect(self.host, self.port or 21)
+        self.conn.login(self.user, self.password)
+        
+        if not self.passive:
             self.conn.set_pasv(False)
     
-    def get(self, path, local=None):
+    def _command(self, func):
+        """
+        Run a command, shaped by the command rate limiter. Transient errors, 421
+        (service not available), 425 (can not open data connection) or 426 (transfer
+        aborted) replies and dropped connections, are retried with a jittered
+        exponential backoff, and lower the rate of the command rate limiter, shared by
+        the sessions of a run. Other replies are raised. The session is reopened when it
+        was closed by the server.
+        """
+        attempt = 0
+        
+        while True:
+            if self.command_rate_limiter:
+                self.command_rate_limiter.consume()
+            
+            try:
+                if self.conn is None:
+                    self.connect()
+                return func()
+            except (error_temp, EOFError, ConnectionError) as e:
+                if not self._is_transient(e):
+                    raise
+                
+                if self._is_connection_lost(e):
+                    self._drop_connection()
+                
+                if self.command_rate_limiter:
+                    self.command_rate_limiter.throttle(COMMAND_THROTTLE_FACTOR, MIN_COMMAND_RATE)
+                
+                if attempt >= MAX_COMMAND_RETRIES:
+                    raise
+                
+                delay = COMMAND_RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+                attempt += 1
+                
+                logger.warning(f"[ADL_FTP_PLUGIN] Transient error from {self.host}: {e}. "
+                               f"Retrying in {delay:.1f}s ({attempt}/{MAX_COMMAND_RETRIES})")
+                time.sleep(delay)
+    
+    @staticmethod
+    def _is_transient(error):
+        return not isinstance(error, error_temp) or str(error)[:3] in RETRY_REPLIES
+    
+    @staticmethod
+    def _is_connection_lost(error):
+        # the server closes the session after a 421 reply
+        return not isinstance(error, error_temp) or str(error).startswith("421")
+    
+    def _drop_connection(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+    
+    def get(self, path, local=None, hasher=None):
+        """
+        Download a file. If a hashlib hasher is given, it is updated with the content
+        while downloading.
+        """
         if isinstance(local, IOBase):  # open file, leave open
             local_file = local
         elif local is None:  # return string
@@ -29,7 +130,33 @@ class FTPClient:
         else:  # path to file, open, write/close return None
             local_file = open(local, 'wb')
         
-        self.conn.retrbinary('RETR ' + path, local_file.write)
+        received = []
+        
+        def callback(chunk):
+            received.append(True)
+            if self.rate_limiter:
+                self.rate_limiter.consume(len(chunk))
+            if hasher is not None:
+                hasher.update(chunk)
+            local_file.write(chunk)
+        
+        def retrieve():
+            try:
+                return self.conn.retrbinary('RETR ' + path, callback)
+            except (error_temp, EOFError, ConnectionError) as e:
+                if not received:
+                    raise
+                # data was already written, so the transfer can not be retried
+                if self._is_connection_lost(e):
+                    self._drop_connection()
+                raise RuntimeError(f"Transfer of {path} interrupted: {e}") from e
+        
+        try:
+            self._command(retrieve)
+        except Exception:
+            if not isinstance(local, IOBase):
+                local_file.close()
+            raise
         
         if isinstance(local, IOBase):
             pass
@@ -45,24 +172,74 @@ class FTPClient:
     def cd(self, remote):
         """ Change working directory on server """
         try:
-            self.conn.cwd(remote)
-        except Exception:
+            self._command(lambda: self.conn.cwd(remote))
+        except error_perm:
             return False
         else:
             return self.pwd()
     
+    def list_names(self, remote):
+        """
+        Return the set of names in a directory, or None if it can not be listed. Cached
+        for the session.
+        """
+        if remote not in self.names_cache:
+            try:
+                names = self._command(lambda: self._nlst(remote))
+                names = {posixpath.basename(name.rstrip('/')) for name in names}
+            except error_perm:
+                names = None
+            self.names_cache[remote] = names
+        
+        return self.names_cache[remote]
+    
+    def _nlst(self, remote):
+        """
+        List the names in a directory. Servers answer the listing of an empty directory
+        with an empty listing or with an error, depending on the server.
+        """
+        try:
+            return self.conn.nlst(remote)
+        except (error_perm, error_temp) as e:
+            if str(e)[:3] in EMPTY_LISTING_REPLIES:
+                return []
+            raise
+    
+    def exists(self, remote):
+        """
+        Check whether a path exists by looking it up in the listing of its parent
+        directory, instead of changing into it. Sibling paths share the parent listing,
+        so probing many date directories costs one round trip per parent. Paths whose
+        parent can not be listed are assumed to exist if the parent itself exists.
+        """
+        remote = posixpath.normpath(remote)
+        parent = posixpath.dirname(remote) or '.'
+        
+        if parent == remote or remote == '.':
+            return True
+        
+        names = self.list_names(parent)
+        
+        if names is not None:
+            return posixpath.basename(remote) in names
+        
+        return self.exists(parent)
+    
     def pwd(self):
         """ Return the current working directory """
-        return self.conn.pwd()
+        return self._command(lambda: self.conn.pwd())
     
     def list(self, remote='.', extra=False, remove_relative_paths=False):
         """ Return directory list """
         if extra:
-            self.tmp_output = []
-            self.conn.dir(remote, self._collector)
+            def collect():
+                self.tmp_output = []
+                self.conn.dir(remote, self._collector)
+            
+            self._command(collect)
             directory_list = split_file_info(self.tmp_output)
         else:
-            directory_list = self.conn.nlst(remote)
+            directory_list = self._command(lambda: self.conn.nlst(remote))
         
         if remove_relative_paths:
             return list(filter(self.is_not_relative_path, directory_list))
@@ -81,6 +258,8 @@ class FTPClient:
     
     def close(self):
         """ End the session """
+        if self.conn is None:
+            return
         try:
             self.conn.quit()
         except Exception:
@@ -0,0 +1,31 @@
+import threading
+
+
+class FTPClientPool:
+    """
+    Hands out one FTP session per thread, created on first use with ``client_factory``,
+    since an ftplib connection can not be shared between threads.
+    """
+    
+    def __init__(self, client_factory):
+        self.client_factory = client_factory
+        self.local = threading.local()
+        self.clients = []
+        self.clients_lock = threading.Lock()
+    
+    def get(self):
+        client = getattr(self.local, "client", None)
+        
+        if client is None:
+            client = self.client_factory()
+            self.local.client = client
+            with self.clients_lock:
+                self.clients.append(client)
+        
+        return client
+    
+    def close(self):
+        with self.clients_lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
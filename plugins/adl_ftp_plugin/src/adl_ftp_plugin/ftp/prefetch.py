@@ -0,0 +1,93 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .pool import FTPClientPool
+
+
+class DownloadedFile:
+    """ A file downloaded by the prefetching downloader """
+    
+    def __init__(self, remote_path, local_path=None, content_hash=None, error=None):
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.content_hash = content_hash
+        self.error = error
+
+
+class PrefetchingDownloader:
+    """
+    Downloads files ahead of their processing, so that transfers overlap with the
+    processing of already downloaded files.
+    
+    Each worker thread uses its own FTP session, created with ``client_factory``. At
+    most ``max_pending`` downloaded or in-flight files are buffered on disk ahead of the
+    consumer. Downloaded files are yielded in the order they were requested, and their
+    temporary copies are deleted once the consumer moves on to the next file.
+    """
+    
+    def __init__(self, client_factory, workers=2, max_pending=None):
+        self.pool = FTPClientPool(client_factory)
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+    
+    def fetch(self, remote_path):
+        hasher = hashlib.sha256()
+        
+        with tempfile.NamedTemporaryFile(suffix=posixpath.basename(remote_path), delete=False) as temp_file:
+            local_path = temp_file.name
+        
+        try:
+            self.pool.get().get(remote_path, local_path, hasher=hasher)
+        except Exception as e:
+            os.remove(local_path)
+            return DownloadedFile(remote_path, error=e)
+        
+        return DownloadedFile(remote_path, local_path, hasher.hexdigest())
+    
+    @staticmethod
+    def remove(future):
+        downloaded_file = future.result()
+        if downloaded_file.local_path and os.path.exists(downloaded_file.local_path):
+            os.remove(downloaded_file.local_path)
+    
+    def download(self, remote_paths):
+        """
+        Downloads the given files.
+        
+        :param remote_paths: The paths of the files to download.
+        :type remote_paths: iterable[str]
+        :return: The downloaded files, in the order of ``remote_paths``.
+        :rtype: collections.abc.Iterator[DownloadedFile]
+        """
+        pending = deque()
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for remote_path in remote_paths:
+                    pending.append(executor.submit(self.fetch, remote_path))
+                    
+                    if len(pending) >= self.max_pending:
+                        future = pending.popleft()
+                        try:
+                            yield future.result()
+                        finally:
+                            self.remove(future)
+                
+                while pending:
+                    future = pending.popleft()
+                    try:
+                        yield future.result()
+                    finally:
+                        self.remove(future)
+            finally:
+                # the consumer stopped early, drop the files fetched ahead
+                for future in pending:
+                    if not future.cancel():
+                        self.remove(future)
+    
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,114 @@
+import sys
+
+from django.db import transaction
+
+from .models import FTPStationDataFile, FTPWorkItem
+
+# Maximum number of data files committed together
+INGEST_BATCH_SIZE = 100
+
+
+class IngestBatch:
+    """
+    Commits the observation records and processing state of several data files in a
+    single transaction.
+    
+    Records written while the batch is open are part of its transaction, and the state
+    of the added data files is saved with one ``bulk_update`` when the batch commits, so
+    a file is never left with its records written but not marked as processed, or the
+    other way around. The batch commits every ``max_files`` files, or only when it is
+    closed if ``max_files`` is None. Work queue items added to the batch are saved in
+    the same transaction.
+    Work to run once the records are committed, like compressing the stored files, can
+    be registered with ``transaction.on_commit``.
+    """
+    
+    STATE_FIELDS = [
+        "processed",
+        "processing_attempts",
+        "error_count",
+        "error_sample",
+        "quarantined",
+        "mapping_plan_hash",
+        "rows_ingested",
+        "first_observation_time",
+        "last_observation_time",
+        "decode_duration",
+    ]
+    
+    WORK_ITEM_FIELDS = [
+        "state",
+        "locked_at",
+        "available_at",
+        "last_error",
+    ]
+    
+    def __init__(self, max_files=INGEST_BATCH_SIZE):
+        self.max_files = max_files
+        self.data_files = []
+        self.work_items = []
+        self.atomic = None
+    
+    def __enter__(self):
+        self.begin()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # roll back the files of the current batch
+            self.data_files = []
+            self.work_items = []
+            # the transaction is already closed if the failure happened while committing
+            if self.atomic is not None:
+                self.close_atomic(exc_type, exc_value, traceback)
+            return
+        
+        self.commit()
+    
+    def begin(self):
+        self.atomic = transaction.atomic()
+        self.atomic.__enter__()
+    
+    def add(self, db_data_file):
+        """
+        Adds a data file whose state should be saved with the batch.
+        
+        :param FTPStationDataFile db_data_file: The data file.
+        """
+        self.data_files.append(db_data_file)
+        
+        if self.max_files and len(self.data_files) >= self.max_files:
+            self.commit()
+            self.begin()
+    
+    def add_work_item(self, work_item):
+        """
+        Adds a work queue item whose state should be saved with the batch.
+        
+        :param FTPWorkItem work_item: The work item.
+        """
+        self.work_items.append(work_item)
+    
+    def commit(self):
+        try:
+            if self.data_files:
+                FTPStationDataFile.objects.bulk_update(self.data_files, self.STATE_FIELDS)
+            
+            if self.work_items:
+                FTPWorkItem.objects.bulk_update(self.work_items, self.WORK_ITEM_FIELDS)
+        except Exception:
+            # roll back, so that the connection is not left inside the transaction
+            self.data_files = []
+            self.work_items = []
+            self.close_atomic(*sys.exc_info())
+            raise
+        
+        self.data_files = []
+        self.work_items = []
+        
+        self.close_atomic(None, None, None)
+    
+    def close_atomic(self, exc_type, exc_value, traceback):
+        atomic = self.atomic
+        self.atomic = None
+        atomic.__exit__(exc_type, exc_value, traceback)
@@ -0,0 +1,137 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adl_ftp_plugin.registries import DECODER_ENTRY_POINT_GROUP, FTPDecoder, FTPDecoderRegistry
+
+# Name of the temporary package advertising the synthetic decoders as entry points
+BENCHMARK_PACKAGE = "adl_ftp_benchmark_decoders"
+
+BENCHMARK_MODULE = """from adl_ftp_plugin.registries import FTPDecoder
+
+for i in range({count}):
+    globals()[f"BenchmarkDecoder{{i}}"] = type(f"BenchmarkDecoder{{i}}", (FTPDecoder,), {{
+        "type": f"benchmark_{{i}}",
+        "display_name": f"Benchmark {{i}}",
+    }})
+"""
+
+STARTUP_CODE = "import django; django.setup(); from adl_ftp_plugin.registries import ftp_decoder_registry; " \
+               "ftp_decoder_registry.get_choices()"
+
+
+class Command(BaseCommand):
+    help = "Benchmark the decoder registry and app startup with many decoders registered"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--decoders", type=int, default=500, help="Number of synthetic decoders to register")
+        parser.add_argument("--lookups", type=int, default=10000, help="Number of choice and decoder lookups")
+        parser.add_argument("--startup-runs", type=int, default=3,
+                            help="Number of Django startups to time in a subprocess, with and without the "
+                                 "synthetic decoders installed as entry points. 0 to skip")
+    
+    def handle(self, *args, **options):
+        decoders_count = options["decoders"]
+        lookups = options["lookups"]
+        
+        if decoders_count < 1:
+            raise CommandError("--decoders must be at least 1")
+        
+        registry = FTPDecoderRegistry()
+        decoder_classes = [
+            type(f"BenchmarkDecoder{i}", (FTPDecoder,), {"type": f"benchmark_{i}", "display_name": f"Benchmark {i}"})
+            for i in range(decoders_count)
+        ]
+        
+        started_at = time.perf_counter()
+        for decoder_class in decoder_classes:
+            registry.register(decoder_class())
+        self.report(f"Register {decoders_count} decoders", time.perf_counter() - started_at)
+        
+        started_at = time.perf_counter()
+        registry.get_choices()
+        self.report("Build choices (cold)", time.perf_counter() - started_at)
+        
+        started_at = time.perf_counter()
+        for _ in range(lookups):
+            registry.get_choices()
+        self.report(f"Build choices (cached) x{lookups}", time.perf_counter() - started_at)
+        
+        started_at = time.perf_counter()
+        for i in range(lookups):
+            registry.get(f"benchmark_{i % decoders_count}")
+        self.report(f"Get decoder by type x{lookups}", time.perf_counter() - started_at)
+        
+        with tempfile.TemporaryDirectory() as package_dir:
+            self.write_entry_point_package(package_dir, decoders_count)
+            
+            self.benchmark_entry_points(package_dir, decoders_count)
+            
+            for run in range(options["startup_runs"]):
+                self.report(f"Django startup, run {run + 1}", self.time_startup())
+                self.report(f"Django startup with {decoders_count} entry point decoders, run {run + 1}",
+                            self.time_startup(package_dir))
+    
+    @staticmethod
+    def write_entry_point_package(package_dir, decoders_count):
+        """
+        Writes a package advertising the synthetic decoders in the decoder entry point
+        group, importable once ``package_dir`` is on the path.
+        """
+        with open(os.path.join(package_dir, f"{BENCHMARK_PACKAGE}.py"), "w") as f:
+            f.write(BENCHMARK_MODULE.format(count=decoders_count))
+        
+        dist_info = os.path.join(package_dir, f"{BENCHMARK_PACKAGE}-0.0.0.dist-info")
+        os.mkdir(dist_info)
+        
+        with open(os.path.join(dist_info, "METADATA"), "w") as f:
+            f.write(f"Metadata-Version: 2.1\nName: {BENCHMARK_PACKAGE}\nVersion: 0.0.0\n")
+        
+        with open(os.path.join(dist_info, "entry_points.txt"), "w") as f:
+            f.write(f"[{DECODER_ENTRY_POINT_GROUP}]\n")
+            for i in range(decoders_count):
+                f.write(f"benchmark_{i} = {BENCHMARK_PACKAGE}:BenchmarkDecoder{i}\n")
+    
+    def benchmark_entry_points(self, package_dir, decoders_count):
+        registry = FTPDecoderRegistry()
+        sys.path.insert(0, package_dir)
+        
+        try:
+            started_at = time.perf_counter()
+            registry.discover_entry_points()
+            self.report(f"Discover {decoders_count} entry point decoders", time.perf_counter() - started_at)
+            
+            started_at = time.perf_counter()
+            registry.get_choices()
+            self.report("Build choices with entry point decoders not loaded", time.perf_counter() - started_at)
+            
+            started_at = time.perf_counter()
+            registry.load_entry_points()
+            self.report(f"Load {decoders_count} entry point decoders", time.perf_counter() - started_at)
+        finally:
+            sys.path.remove(package_dir)
+            sys.modules.pop(BENCHMARK_PACKAGE, None)
+    
+    @staticmethod
+    def time_startup(package_dir=None):
+        """
+        Times the startup of Django in a subprocess, with the decoders of the given
+        package directory installed as entry points.
+        """
+        env = os.environ.copy()
+        
+        paths = [path for path in sys.path if path]
+        if package_dir:
+            paths.insert(0, package_dir)
+        env["PYTHONPATH"] = os.pathsep.join(paths)
+        
+        started_at = time.perf_counter()
+        subprocess.run([sys.executable, "-c", STARTUP_CODE], check=True, env=env)
+        return time.perf_counter() - started_at
+    
+    def report(self, label, seconds):
+        self.stdout.write(f"{label}: {seconds * 1000:.2f} ms")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from adl_ftp_plugin.models import NetworkFTP
+from adl_ftp_plugin.runner import collect_networks
+
+
+class Command(BaseCommand):
+    help = "Collect several FTP networks concurrently, within global limits on threads, FTP sessions and " \
+           "database connections"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--network", type=int, action="append", dest="network_ids",
+                            help="Id of a Network FTP to collect. Can be repeated. Defaults to all networks")
+        parser.add_argument("--workers", type=int, help="Maximum number of networks collected at the same time")
+        parser.add_argument("--max-sessions", type=int,
+                            help="Maximum number of FTP sessions open at once, across all networks")
+        parser.add_argument("--max-db-connections", type=int,
+                            help="Maximum number of database connections used at once")
+    
+    def handle(self, *args, **options):
+        network_ftps = NetworkFTP.objects.select_related("network")
+        
+        if options["network_ids"]:
+            network_ftps = network_ftps.filter(pk__in=options["network_ids"])
+        
+        if not network_ftps:
+            raise CommandError("No Network FTP found")
+        
+        errors = collect_networks(network_ftps, max_workers=options["workers"], max_sessions=options["max_sessions"],
+                                  max_db_connections=options["max_db_connections"])
+        
+        for network_ftp in network_ftps:
+            if network_ftp.pk in errors:
+                self.stderr.write(f"{network_ftp.network.name}: {errors[network_ftp.pk]}")
+            else:
+                self.stdout.write(f"{network_ftp.network.name}: collected")
+        
+        if errors:
+            raise CommandError(f"{len(errors)} networks failed")
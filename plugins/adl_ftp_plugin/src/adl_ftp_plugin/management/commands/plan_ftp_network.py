@@ -0,0 +1,45 @@
+import json
+
+from dateutil import parser as date_parser
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone as dj_timezone
+
+from adl_ftp_plugin.models import NetworkFTP
+from adl_ftp_plugin.plugins import AdlFtpPlugin
+
+
+class Command(BaseCommand):
+    help = "Report, as JSON, the paths, matching files and bytes a run of a Network FTP would collect, and how " \
+           "many of the files are new, without downloading anything"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("network_id", type=int, help="Id of the Network FTP")
+        parser.add_argument("--station-link", type=int, action="append", dest="station_link_ids",
+                            help="Id of a station link to plan. Can be repeated. Defaults to all station links")
+        parser.add_argument("--start-date",
+                            help="Plan from this date instead of the start date of each station link, "
+                                 "e.g. 2024-01-01")
+        parser.add_argument("--file-pattern",
+                            help="Plan with this file pattern instead of the one of each station link")
+        parser.add_argument("--indent", type=int, default=2, help="Indentation of the JSON output")
+    
+    def handle(self, *args, **options):
+        network_ftp = NetworkFTP.objects.select_related("network").filter(pk=options["network_id"]).first()
+        
+        if not network_ftp:
+            raise CommandError(f"Network FTP {options['network_id']} not found")
+        
+        start_date = None
+        if options["start_date"]:
+            try:
+                start_date = date_parser.parse(options["start_date"])
+            except (ValueError, OverflowError) as e:
+                raise CommandError(f"Invalid start date: {e}")
+            
+            if dj_timezone.is_naive(start_date):
+                start_date = dj_timezone.make_aware(start_date)
+        
+        summary = AdlFtpPlugin.plan(network_ftp, station_link_ids=options["station_link_ids"],
+                                    start_date=start_date, file_pattern=options["file_pattern"])
+        
+        self.stdout.write(json.dumps(summary, indent=options["indent"] or None))
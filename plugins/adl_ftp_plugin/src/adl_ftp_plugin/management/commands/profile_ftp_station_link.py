@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from adl_ftp_plugin.collector import NetworkCollector
+from adl_ftp_plugin.models import FTPStationLink, NetworkFTP
+
+
+class Command(BaseCommand):
+    help = "Collect and process the new files of a station link while profiling the run, and save the profile " \
+           "and the time spent in each stage to the media storage"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("station_link_id", type=int, help="Id of the FTP station link")
+    
+    def handle(self, *args, **options):
+        station_link = FTPStationLink.objects.select_related("station").filter(pk=options["station_link_id"]).first()
+        
+        if not station_link:
+            raise CommandError(f"Station link {options['station_link_id']} not found")
+        
+        network_ftp = NetworkFTP.objects.get(pk=station_link.network_connection_id)
+        collector = NetworkCollector(network_ftp)
+        
+        if not collector.setup():
+            raise CommandError("The network of the station link can not be processed")
+        
+        collector.profile_station_link(station_link)
+        
+        if not station_link.last_profile_path:
+            raise CommandError("The profile could not be saved")
+        
+        self.stdout.write(f"Profile summary saved to {station_link.last_profile_path}")
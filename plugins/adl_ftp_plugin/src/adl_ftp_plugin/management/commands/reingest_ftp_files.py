@@ -0,0 +1,84 @@
+import os
+
+from dateutil import parser as date_parser
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone as dj_timezone
+
+from adl_ftp_plugin.reingest import get_reingest_data_files, run_reingest, REINGEST_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Decode stored data files again and save their observation records, in parallel processes, without " \
+           "contacting the FTP servers. Records already saved are left as they are, unless --overwrite is given"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--network", type=int, action="append", dest="network_ids",
+                            help="Id of a Network FTP. Can be repeated. Defaults to all networks")
+        parser.add_argument("--station", type=int, action="append", dest="station_ids",
+                            help="Id of a station. Can be repeated. Defaults to all stations")
+        parser.add_argument("--from", dest="date_from",
+                            help="Only files with observations from this date. Files without observation times are "
+                                 "matched on their modification time on the FTP server, and left out if unknown, "
+                                 "e.g. for files downloaded before these were recorded")
+        parser.add_argument("--to", dest="date_to",
+                            help="Only files with observations up to this date. Files without observation times are "
+                                 "matched as with --from")
+        parser.add_argument("--decoder", help="Only files decoded with this decoder")
+        parser.add_argument("--overwrite", action="store_true",
+                            help="Replace the value of the records already saved, e.g. after fixing the units of "
+                                 "a variable mapping")
+        parser.add_argument("--include-quarantined", action="store_true", help="Also re-ingest quarantined files")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes. Defaults to the number of CPUs")
+        parser.add_argument("--chunk-size", type=int, default=REINGEST_CHUNK_SIZE,
+                            help="Number of files processed by a worker at a time")
+    
+    def parse_date(self, value):
+        if not value:
+            return None
+        
+        try:
+            date = date_parser.parse(value)
+        except (ValueError, OverflowError) as e:
+            raise CommandError(f"Invalid date {value}: {e}")
+        
+        return dj_timezone.make_aware(date) if dj_timezone.is_naive(date) else date
+    
+    def handle(self, *args, **options):
+        filters = {
+            "network_ftp_ids": options["network_ids"],
+            "station_ids": options["station_ids"],
+            "decoder": options["decoder"],
+            "include_quarantined": options["include_quarantined"],
+        }
+        date_from = self.parse_date(options["date_from"])
+        date_to = self.parse_date(options["date_to"])
+        
+        data_files = get_reingest_data_files(date_from=date_from, date_to=date_to, **filters)
+        
+        if date_from or date_to:
+            undated_count = get_reingest_data_files(**filters).filter(first_observation_time__isnull=True,
+                                                                      remote_modified_at__isnull=True).count()
+            if undated_count:
+                self.stderr.write(f"{undated_count} files without observation or modification times are left out "
+                                  f"by the date filters. Re-ingest them without --from and --to")
+        
+        data_file_ids = list(data_files.values_list("pk", flat=True))
+        total = len(data_file_ids)
+        
+        if not total:
+            raise CommandError("No stored data file matches the filters")
+        
+        self.stdout.write(f"Re-ingesting {total} files on {options['workers']} workers")
+        
+        def progress(totals, elapsed):
+            done = totals["files"] + totals["failed"]
+            elapsed = max(elapsed, 0.001)
+            self.stdout.write(f"{done}/{total} files ({totals['failed']} failed), {totals['rows']} rows, "
+                              f"{done / elapsed:.1f} files/s, {totals['rows'] / elapsed:.0f} rows/s")
+        
+        totals = run_reingest(data_file_ids, workers=options["workers"], chunk_size=max(options["chunk_size"], 1),
+                              overwrite=options["overwrite"], progress=progress)
+        
+        self.stdout.write(f"Re-ingested {totals['files']} files and {totals['rows']} rows, "
+                          f"{totals['failed']} files failed")
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0013_alter_ftpstationlink_date_granularity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='skip_invalid_rows',
+            field=models.BooleanField(default=True, help_text='Skip and record rows that can not be decoded, instead of failing the whole file', verbose_name='Skip invalid rows'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='processing_attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Processing Attempts'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='error_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of rows that could not be decoded', verbose_name='Error Count'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='error_sample',
+            field=models.TextField(blank=True, null=True, verbose_name='Error Sample'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='quarantined',
+            field=models.BooleanField(default=False, help_text='Quarantined files failed processing repeatedly and are no longer downloaded or processed', verbose_name='Quarantined'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0014_ftpstationlink_skip_invalid_rows_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='archive_member',
+            field=models.CharField(blank=True, help_text='Name of the file inside the zip archive, for files extracted from archives', max_length=255, null=True, verbose_name='Archive Member'),
+        ),
+    ]
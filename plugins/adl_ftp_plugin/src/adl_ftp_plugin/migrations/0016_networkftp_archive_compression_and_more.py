@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-19 10:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0015_ftpstationdatafile_archive_member'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='archive_compression',
+            field=models.CharField(blank=True, choices=[('gzip', 'Gzip'), ('bz2', 'Bzip2')], help_text='Compress downloaded files once they have been processed', max_length=255, null=True, verbose_name='Archive Compression'),
+        ),
+        migrations.AddField(
+            model_name='networkftp',
+            name='bundle_daily_files',
+            field=models.BooleanField(default=False, help_text='Pack small processed files into one archive per station and day', verbose_name='Bundle daily files'),
+        ),
+        migrations.AddField(
+            model_name='networkftp',
+            name='raw_file_retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Delete downloaded files after this number of days, keeping their records. Leave blank to keep files forever', null=True, verbose_name='Raw File Retention (days)'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Created At'),
+            preserve_default=False,
+        ),
+    ]
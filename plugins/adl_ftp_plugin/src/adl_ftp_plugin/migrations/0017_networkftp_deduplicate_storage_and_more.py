@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0016_networkftp_archive_compression_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='deduplicate_storage',
+            field=models.BooleanField(default=True, help_text='Store files with identical content only once', verbose_name='Deduplicate stored files'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 hash of the file content', max_length=64, null=True, verbose_name='Content Hash'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0017_networkftp_deduplicate_storage_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FTPStationLinkLatestObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.DateTimeField(verbose_name='Latest Observation Time')),
+                ('parameter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.dataparameter', verbose_name='Parameter')),
+                ('station_link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latest_observations', to='adl_ftp_plugin.ftpstationlink')),
+            ],
+            options={
+                'unique_together': {('station_link', 'parameter')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0018_ftpstationlinklatestobservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='detected_decoder',
+            field=models.CharField(blank=True, help_text='Decoder detected from the data files, when the network decoder is set to auto-detect', max_length=255, null=True, verbose_name='Detected Decoder'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='detected_decoder_signature',
+            field=models.CharField(blank=True, help_text='File pattern the decoder was detected for', max_length=255, null=True, verbose_name='Detected Decoder Signature'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0019_ftpstationlink_detected_decoder_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='adaptive_polling',
+            field=models.BooleanField(default=False, help_text='Poll the station around the expected arrival of its next file, learned from previous files, and less often while it is silent', verbose_name='Adaptive polling'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='next_poll_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Next Poll At'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='arrival_interval',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Learned Arrival Interval (seconds)'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='consecutive_empty_polls',
+            field=models.PositiveIntegerField(default=0, verbose_name='Consecutive Empty Polls'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='remote_modified_at',
+            field=models.DateTimeField(blank=True, help_text='Modification time of the file on the FTP server', null=True, verbose_name='Remote Modified At'),
+        ),
+    ]
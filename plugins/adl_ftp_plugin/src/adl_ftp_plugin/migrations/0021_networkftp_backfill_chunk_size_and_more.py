@@ -0,0 +1,48 @@
+# Generated by Django 5.1.3 on 2026-10-19 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0020_ftpstationlink_adaptive_polling_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='backfill_chunk_size',
+            field=models.PositiveIntegerField(default=24, help_text='Number of date directories processed between backfill checkpoints', verbose_name='Backfill Chunk Size'),
+        ),
+        migrations.AddField(
+            model_name='networkftp',
+            name='backfill_max_bytes_per_second',
+            field=models.PositiveIntegerField(blank=True, help_text='Leave blank for no limit', null=True, verbose_name='Backfill Bandwidth Limit (bytes/s)'),
+        ),
+        migrations.AddField(
+            model_name='networkftp',
+            name='backfill_max_records_per_second',
+            field=models.PositiveIntegerField(blank=True, help_text='Leave blank for no limit', null=True, verbose_name='Backfill Write Limit (records/s)'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='backfill_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], max_length=255, null=True, verbose_name='Backfill Status'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='backfill_start_date',
+            field=models.DateTimeField(blank=True, help_text='Start date the backfill progress refers to', null=True, verbose_name='Backfill Start Date'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='backfill_checkpoint',
+            field=models.DateTimeField(blank=True, help_text='Historical data before this date has been collected', null=True, verbose_name='Backfill Checkpoint'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='backfill_heartbeat',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Backfill Heartbeat'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0021_networkftp_backfill_chunk_size_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='max_parallel_downloads',
+            field=models.PositiveIntegerField(default=1, help_text='Number of files downloaded ahead, on separate FTP sessions, while files are being processed', verbose_name='Parallel Downloads'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:02
+
+import adl_ftp_plugin.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0022_networkftp_max_parallel_downloads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='max_parallel_listings',
+            field=models.PositiveIntegerField(default=1, help_text='Number of FTP sessions used to list the date directories of templated FTP paths', verbose_name='Parallel Directory Listings'),
+        ),
+        migrations.AlterField(
+            model_name='ftpstationlink',
+            name='dir_structured_by_date',
+            field=models.BooleanField(default=False, help_text='Check if the files are structured by a combination of year, month, day or hour in the FTP path. Folders structure expected to be in the format [YYYY]/[MM]/[DD]/[HH]. Not needed when the FTP path contains date tokens', verbose_name='Directory Structured by Date ?'),
+        ),
+        migrations.AlterField(
+            model_name='ftpstationlink',
+            name='ftp_path',
+            field=models.CharField(help_text='Path to the directory containing the data files. Can contain the tokens {YYYY}, {YY}, {MM}, {DD}, {DOY}, {HH} for the date and {station} for the station name, e.g. /data/{station}/{YYYY}{MM}{DD}', max_length=255, validators=[adl_ftp_plugin.validators.validate_ftp_path_template], verbose_name='FTP Path'),
+        ),
+    ]
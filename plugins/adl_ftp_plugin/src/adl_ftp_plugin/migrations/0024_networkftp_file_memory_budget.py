@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0023_networkftp_max_parallel_listings_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='file_memory_budget',
+            field=models.PositiveIntegerField(blank=True, default=64, help_text='Files whose decompressed content is larger than this are decoded in chunks, with their records spooled to disk. Leave blank for no limit', null=True, verbose_name='File Memory Budget (MB)'),
+        ),
+    ]
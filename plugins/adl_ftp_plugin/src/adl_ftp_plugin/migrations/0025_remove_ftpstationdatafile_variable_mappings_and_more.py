@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0024_networkftp_file_memory_budget'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ftpstationdatafile',
+            name='variable_mappings',
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='decode_duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='Decode Duration (seconds)'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='first_observation_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='First Observation Time'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='last_observation_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last Observation Time'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='mapping_plan_hash',
+            field=models.CharField(blank=True, help_text='Hash of the variable mappings the file was ingested with', max_length=64, null=True, verbose_name='Mapping Plan Hash'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationdatafile',
+            name='rows_ingested',
+            field=models.PositiveIntegerField(default=0, verbose_name='Rows Ingested'),
+        ),
+        migrations.AddIndex(
+            model_name='ftpstationdatafile',
+            index=models.Index(fields=['station_link', 'processed', 'file_name'], name='adl_ftp_datafile_state_idx'),
+        ),
+    ]
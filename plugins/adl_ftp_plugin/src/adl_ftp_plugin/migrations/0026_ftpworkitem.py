@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0025_remove_ftpstationdatafile_variable_mappings_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FTPWorkItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=255, verbose_name='State')),
+                ('priority', models.IntegerField(default=10, help_text='Items with a higher priority are processed first', verbose_name='Priority')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='The item is not processed before this time', verbose_name='Available At')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Locked At')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('data_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='work_item', to='adl_ftp_plugin.ftpstationdatafile')),
+                ('station_link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='work_items', to='adl_ftp_plugin.ftpstationlink')),
+            ],
+            options={
+                'verbose_name': 'FTP Work Item',
+                'verbose_name_plural': 'FTP Work Items',
+                'indexes': [models.Index(fields=['state', '-priority', 'available_at'], name='adl_ftp_workitem_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0026_ftpworkitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='max_bytes_per_second',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum download rate, across all sessions. Leave blank for no limit', null=True, verbose_name='Bandwidth Limit (bytes/s)'),
+        ),
+        migrations.AddField(
+            model_name='networkftp',
+            name='max_commands_per_second',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of FTP commands per second, across all sessions. Leave blank for no limit', null=True, verbose_name='Command Rate Limit (commands/s)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0027_networkftp_max_bytes_per_second_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkftp',
+            name='observation_cache_size',
+            field=models.PositiveIntegerField(default=50000, help_text='Number of recently saved observations remembered per station, so that the rows of overlapping files are dropped before they reach the database. 0 to disable', verbose_name='Observation Cache Size'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adl_ftp_plugin', '0028_networkftp_observation_cache_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='last_profile_path',
+            field=models.CharField(blank=True, help_text='Storage path of the summary of the last profiled run', max_length=255, null=True, verbose_name='Last Profile'),
+        ),
+        migrations.AddField(
+            model_name='ftpstationlink',
+            name='profile_next_run',
+            field=models.BooleanField(default=False, help_text='Capture a profile and the time spent in each stage of the next run of this station, saved to the media storage. Cleared once the profile is saved', verbose_name='Profile next run'),
+        ),
+    ]
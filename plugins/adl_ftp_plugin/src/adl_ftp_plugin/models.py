@@ -1,6 +1,7 @@
 from adl.core.models import DataParameter
 from adl.core.models import NetworkConnection, StationLink
 from django.db import models
+from django.utils import timezone as dj_timezone
 from django.utils.translation import gettext_lazy as _
 from modelcluster.fields import ParentalKey
 from timezone_field import TimeZoneField
@@ -9,16 +10,67 @@ from wagtail.models import Orderable
 from wagtail.snippets.models import register_snippet
 
 from adl_ftp_plugin.utils import get_ftp_decoder_choices
-from adl_ftp_plugin.validators import validate_start_date
+from adl_ftp_plugin.validators import validate_start_date, validate_ftp_path_template
 
 
 @register_snippet
 class NetworkFTP(NetworkConnection):
+    ARCHIVE_COMPRESSION_CHOICES = [
+        ("gzip", _("Gzip")),
+        ("bz2", _("Bzip2")),
+    ]
+    
     host = models.CharField(max_length=255, verbose_name=_("Host"))
     port = models.IntegerField(verbose_name=_("Port"))
     username = models.CharField(max_length=255, verbose_name=_("Username"))
     password = models.CharField(max_length=255, verbose_name=_("Password"))
     decoder = models.CharField(max_length=255, choices=get_ftp_decoder_choices, verbose_name=_("Decoder"))
+    max_parallel_downloads = models.PositiveIntegerField(default=1, verbose_name=_("Parallel Downloads"),
+                                                         help_text=_("Number of files downloaded ahead, on separate "
+                                                                     "FTP sessions, while files are being processed"))
+    max_parallel_listings = models.PositiveIntegerField(default=1, verbose_name=_("Parallel Directory Listings"),
+                                                        help_text=_("Number of FTP sessions used to list the date "
+                                                                    "directories of templated FTP paths"))
+    max_commands_per_second = models.PositiveIntegerField(blank=True, null=True,
+                                                          verbose_name=_("Command Rate Limit (commands/s)"),
+                                                          help_text=_("Maximum number of FTP commands per second, "
+                                                                      "across all sessions. Leave blank for no limit"))
+    max_bytes_per_second = models.PositiveIntegerField(blank=True, null=True,
+                                                       verbose_name=_("Bandwidth Limit (bytes/s)"),
+                                                       help_text=_("Maximum download rate, across all sessions. "
+                                                                   "Leave blank for no limit"))
+    file_memory_budget = models.PositiveIntegerField(blank=True, null=True, default=64,
+                                                     verbose_name=_("File Memory Budget (MB)"),
+                                                     help_text=_("Files whose decompressed content is larger than "
+                                                                 "this are decoded in chunks, with their records "
+                                                                 "spooled to disk. Leave blank for no limit"))
+    observation_cache_size = models.PositiveIntegerField(default=50000, verbose_name=_("Observation Cache Size"),
+                                                         help_text=_("Number of recently saved observations "
+                                                                     "remembered per station, so that the rows of "
+                                                                     "overlapping files are dropped before they "
+                                                                     "reach the database. 0 to disable"))
+    archive_compression = models.CharField(max_length=255, blank=True, null=True, choices=ARCHIVE_COMPRESSION_CHOICES,
+                                           verbose_name=_("Archive Compression"),
+                                           help_text=_("Compress downloaded files once they have been processed"))
+    deduplicate_storage = models.BooleanField(default=True, verbose_name=_("Deduplicate stored files"),
+                                              help_text=_("Store files with identical content only once"))
+    bundle_daily_files = models.BooleanField(default=False, verbose_name=_("Bundle daily files"),
+                                             help_text=_("Pack small processed files into one archive per station "
+                                                         "and day"))
+    backfill_chunk_size = models.PositiveIntegerField(default=24, verbose_name=_("Backfill Chunk Size"),
+                                                      help_text=_("Number of date directories processed between "
+                                                                  "backfill checkpoints"))
+    backfill_max_bytes_per_second = models.PositiveIntegerField(blank=True, null=True,
+                                                                verbose_name=_("Backfill Bandwidth Limit (bytes/s)"),
+                                                                help_text=_("Leave blank for no limit"))
+    backfill_max_records_per_second = models.PositiveIntegerField(blank=True, null=True,
+                                                                  verbose_name=_("Backfill Write Limit (records/s)"),
+                                                                  help_text=_("Leave blank for no limit"))
+    raw_file_retention_days = models.PositiveIntegerField(blank=True, null=True,
+                                                          verbose_name=_("Raw File Retention (days)"),
+                                                          help_text=_("Delete downloaded files after this number of "
+                                                                      "days, keeping their records. Leave blank to "
+                                                                      "keep files forever"))
     
     panels = NetworkConnection.panels + [
         MultiFieldPanel([
@@ -27,7 +79,26 @@ class NetworkFTP(NetworkConnection):
             FieldPanel("username"),
             FieldPanel("password"),
         ], heading=_("FTP Credentials")),
+        MultiFieldPanel([
+            FieldPanel("max_parallel_downloads"),
+            FieldPanel("max_parallel_listings"),
+            FieldPanel("max_commands_per_second"),
+            FieldPanel("max_bytes_per_second"),
+        ], heading=_("Connection Limits")),
         FieldPanel("decoder"),
+        FieldPanel("file_memory_budget"),
+        FieldPanel("observation_cache_size"),
+        MultiFieldPanel([
+            FieldPanel("archive_compression"),
+            FieldPanel("deduplicate_storage"),
+            FieldPanel("bundle_daily_files"),
+            FieldPanel("raw_file_retention_days"),
+        ], heading=_("File Storage")),
+        MultiFieldPanel([
+            FieldPanel("backfill_chunk_size"),
+            FieldPanel("backfill_max_bytes_per_second"),
+            FieldPanel("backfill_max_records_per_second"),
+        ], heading=_("Historical Data Backfill")),
         InlinePanel("variable_mappings", label=_("Variable Mapping"), heading=_("Variable Mappings")),
     ]
     
@@ -62,14 +133,29 @@ class FTPStationLink(StationLink):
         ("hour", _("Hour")),
     ]
     
-    ftp_path = models.CharField(max_length=255, verbose_name=_("FTP Path"),
-                                help_text=_("Path to the directory containing the data files"))
+    BACKFILL_QUEUED = "queued"
+    BACKFILL_RUNNING = "running"
+    BACKFILL_COMPLETED = "completed"
+    BACKFILL_FAILED = "failed"
+    
+    BACKFILL_STATUS_CHOICES = [
+        (BACKFILL_QUEUED, _("Queued")),
+        (BACKFILL_RUNNING, _("Running")),
+        (BACKFILL_COMPLETED, _("Completed")),
+        (BACKFILL_FAILED, _("Failed")),
+    ]
+    
+    ftp_path = models.CharField(max_length=255, validators=[validate_ftp_path_template], verbose_name=_("FTP Path"),
+                                help_text=_("Path to the directory containing the data files. Can contain the "
+                                            "tokens {YYYY}, {YY}, {MM}, {DD}, {DOY}, {HH} for the date and "
+                                            "{station} for the station name, e.g. /data/{station}/{YYYY}{MM}{DD}"))
     file_pattern = models.CharField(max_length=255, verbose_name=_("File Pattern"))
     dir_structured_by_date = models.BooleanField(default=False, verbose_name=_("Directory Structured by Date ?"),
                                                  help_text=_("Check if the files are structured by a combination of"
                                                              " year, month, day or hour in the FTP path. Folders "
                                                              "structure expected to be in the format "
-                                                             "[YYYY]/[MM]/[DD]/[HH]"))
+                                                             "[YYYY]/[MM]/[DD]/[HH]. Not needed when the FTP path "
+                                                             "contains date tokens"))
     date_granularity = models.CharField(max_length=255, blank=True, null=True, choices=DATE_GRANULARITY_CHOICES,
                                         verbose_name=_("Date Granularity"),
                                         help_text=_("How far down the date hierarchy is the file located ? "
@@ -89,6 +175,36 @@ class FTPStationLink(StationLink):
                                                        verbose_name=_("Skip processing already processed files"),
                                                        help_text=_(
                                                            "Do not process files that have already been processed"))
+    detected_decoder = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("Detected Decoder"),
+                                        help_text=_("Decoder detected from the data files, when the network "
+                                                    "decoder is set to auto-detect"))
+    detected_decoder_signature = models.CharField(max_length=255, blank=True, null=True,
+                                                  verbose_name=_("Detected Decoder Signature"),
+                                                  help_text=_("File pattern the decoder was detected for"))
+    backfill_status = models.CharField(max_length=255, blank=True, null=True, choices=BACKFILL_STATUS_CHOICES,
+                                       verbose_name=_("Backfill Status"))
+    backfill_start_date = models.DateTimeField(blank=True, null=True, verbose_name=_("Backfill Start Date"),
+                                               help_text=_("Start date the backfill progress refers to"))
+    backfill_checkpoint = models.DateTimeField(blank=True, null=True, verbose_name=_("Backfill Checkpoint"),
+                                               help_text=_("Historical data before this date has been collected"))
+    backfill_heartbeat = models.DateTimeField(blank=True, null=True, verbose_name=_("Backfill Heartbeat"))
+    adaptive_polling = models.BooleanField(default=False, verbose_name=_("Adaptive polling"),
+                                           help_text=_("Poll the station around the expected arrival of its next file, "
+                                                       "learned from previous files, and less often while it is "
+                                                       "silent"))
+    next_poll_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Next Poll At"))
+    arrival_interval = models.PositiveIntegerField(blank=True, null=True,
+                                                   verbose_name=_("Learned Arrival Interval (seconds)"))
+    consecutive_empty_polls = models.PositiveIntegerField(default=0, verbose_name=_("Consecutive Empty Polls"))
+    skip_invalid_rows = models.BooleanField(default=True, verbose_name=_("Skip invalid rows"),
+                                            help_text=_("Skip and record rows that can not be decoded, instead of "
+                                                        "failing the whole file"))
+    profile_next_run = models.BooleanField(default=False, verbose_name=_("Profile next run"),
+                                           help_text=_("Capture a profile and the time spent in each stage of the "
+                                                       "next run of this station, saved to the media storage. "
+                                                       "Cleared once the profile is saved"))
+    last_profile_path = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("Last Profile"),
+                                         help_text=_("Storage path of the summary of the last profiled run"))
     
     panels = StationLink.panels + [
         MultiFieldPanel([
@@ -105,7 +221,10 @@ class FTPStationLink(StationLink):
             FieldPanel("start_date"),
             FieldPanel("skip_already_downloaded_files"),
             FieldPanel("skip_already_processed_files"),
+            FieldPanel("skip_invalid_rows"),
         ], heading=_("Data Collection")),
+        FieldPanel("adaptive_polling"),
+        FieldPanel("profile_next_run"),
     ]
     
     class Meta:
@@ -114,6 +233,65 @@ class FTPStationLink(StationLink):
     
     def __str__(self):
         return f"{self.network_connection} - {self.station}"
+    
+    def get_ingestion_cutoff(self, variable_mappings):
+        """
+        Returns the time, in the station timezone, up to which observations of all the
+        mapped parameters have already been ingested. Older rows can be skipped when
+        decoding.
+        
+        :param variable_mappings: The variable mappings of the network.
+        :return: The naive station local time, or None if a parameter has not been
+            ingested yet.
+        :rtype: datetime.datetime | None
+        """
+        latest_times = dict(self.latest_observations.values_list("parameter_id", "time"))
+        times = [latest_times.get(variable_mapping.adl_parameter_id) for variable_mapping in variable_mappings]
+        
+        if not times or None in times:
+            return None
+        
+        return dj_timezone.make_naive(min(times), self.timezone)
+    
+    def update_latest_observations(self, obs_records):
+        """
+        Moves the latest ingested observation time of each parameter forward
+        to cover the given observation records.
+        
+        :param obs_records: The ingested observation records.
+        :type obs_records: list[ObservationRecord]
+        """
+        latest_times = {}
+        for obs_record in obs_records:
+            parameter_id = obs_record.parameter_id
+            if parameter_id not in latest_times or obs_record.time > latest_times[parameter_id]:
+                latest_times[parameter_id] = obs_record.time
+        
+        existing_times = dict(self.latest_observations.filter(parameter_id__in=latest_times.keys())
+                              .values_list("parameter_id", "time"))
+        
+        latest_observations = [
+            FTPStationLinkLatestObservation(station_link=self, parameter_id=parameter_id, time=time)
+            for parameter_id, time in latest_times.items()
+            if parameter_id not in existing_times or time > existing_times[parameter_id]
+        ]
+        
+        if latest_observations:
+            FTPStationLinkLatestObservation.objects.bulk_create(latest_observations, update_conflicts=True,
+                                                                unique_fields=["station_link", "parameter"],
+                                                                update_fields=["time"])
+
+
+class FTPStationLinkLatestObservation(models.Model):
+    station_link = models.ForeignKey(FTPStationLink, on_delete=models.CASCADE, related_name="latest_observations")
+    parameter = models.ForeignKey(DataParameter, on_delete=models.CASCADE, verbose_name=_("Parameter"))
+    time = models.DateTimeField(verbose_name=_("Latest Observation Time"))
+    
+    class Meta:
+        unique_together = ("station_link", "parameter")
+    
+    def __str__(self):
+        return f"{self.station_link} - {self.parameter} - {self.time}"
 
 
 def get_ftp_data_file_upload_path(instance, filename):
@@ -125,12 +303,76 @@ class FTPStationDataFile(models.Model):
     station_link = models.ForeignKey(FTPStationLink, on_delete=models.CASCADE, related_name="data_files")
     file_name = models.CharField(max_length=255, verbose_name=_("File Name"))
     file = models.FileField(upload_to=get_ftp_data_file_upload_path, verbose_name=_("File"))
+    archive_member = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("Archive Member"),
+                                      help_text=_("Name of the file inside the zip archive, "
+                                                  "for files extracted from archives"))
+    remote_modified_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Remote Modified At"),
+                                              help_text=_("Modification time of the file on the FTP server"))
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True,
+                                    verbose_name=_("Content Hash"), help_text=_("SHA-256 hash of the file content"))
     processed = models.BooleanField(default=False, verbose_name=_("Processed"))
-    variable_mappings = models.ManyToManyField(FTPVariableMapping, verbose_name=_("Variable Mappings"))
+    processing_attempts = models.PositiveIntegerField(default=0, verbose_name=_("Processing Attempts"))
+    error_count = models.PositiveIntegerField(default=0, verbose_name=_("Error Count"),
+                                              help_text=_("Number of rows that could not be decoded"))
+    error_sample = models.TextField(blank=True, null=True, verbose_name=_("Error Sample"))
+    quarantined = models.BooleanField(default=False, verbose_name=_("Quarantined"),
+                                      help_text=_("Quarantined files failed processing repeatedly and are no longer "
+                                                  "downloaded or processed"))
+    mapping_plan_hash = models.CharField(max_length=64, blank=True, null=True, verbose_name=_("Mapping Plan Hash"),
+                                         help_text=_("Hash of the variable mappings the file was ingested with"))
+    rows_ingested = models.PositiveIntegerField(default=0, verbose_name=_("Rows Ingested"))
+    first_observation_time = models.DateTimeField(blank=True, null=True, verbose_name=_("First Observation Time"))
+    last_observation_time = models.DateTimeField(blank=True, null=True, verbose_name=_("Last Observation Time"))
+    decode_duration = models.FloatField(blank=True, null=True, verbose_name=_("Decode Duration (seconds)"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
     
     class Meta:
         verbose_name = _("FTP Station Data File")
         verbose_name_plural = _("FTP Station Data Files")
+        indexes = [
+            models.Index(fields=["station_link", "processed", "file_name"], name="adl_ftp_datafile_state_idx"),
+        ]
     
     def __str__(self):
+        if self.archive_member:
+            return f"{self.station_link} - {self.file_name}/{self.archive_member}"
         return f"{self.station_link} - {self.file_name}"
+
+
+class FTPWorkItem(models.Model):
+    STATE_PENDING = "pending"
+    STATE_PROCESSING = "processing"
+    STATE_DONE = "done"
+    STATE_FAILED = "failed"
+    
+    STATE_CHOICES = [
+        (STATE_PENDING, _("Pending")),
+        (STATE_PROCESSING, _("Processing")),
+        (STATE_DONE, _("Done")),
+        (STATE_FAILED, _("Failed")),
+    ]
+    
+    PRIORITY_BACKFILL = 0
+    PRIORITY_REALTIME = 10
+    
+    station_link = models.ForeignKey(FTPStationLink, on_delete=models.CASCADE, related_name="work_items")
+    data_file = models.OneToOneField(FTPStationDataFile, on_delete=models.CASCADE, related_name="work_item")
+    state = models.CharField(max_length=255, choices=STATE_CHOICES, default=STATE_PENDING, verbose_name=_("State"))
+    priority = models.IntegerField(default=PRIORITY_REALTIME, verbose_name=_("Priority"),
+                                   help_text=_("Items with a higher priority are processed first"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    available_at = models.DateTimeField(default=dj_timezone.now, verbose_name=_("Available At"),
+                                        help_text=_("The item is not processed before this time"))
+    locked_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Locked At"))
+    last_error = models.TextField(blank=True, null=True, verbose_name=_("Last Error"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
+    
+    class Meta:
+        verbose_name = _("FTP Work Item")
+        verbose_name_plural = _("FTP Work Items")
+        indexes = [
+            models.Index(fields=["state", "-priority", "available_at"], name="adl_ftp_workitem_queue_idx"),
+        ]
+    
+    def __str__(self):
+        return f"{self.data_file} - {self.state}"
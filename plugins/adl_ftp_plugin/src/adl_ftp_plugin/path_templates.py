@@ -0,0 +1,192 @@
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .ftp.pool import FTPClientPool
+
+TOKEN_PATTERN = re.compile(r"\{(\w+)\}")
+
+GRANULARITY_ORDER = ["year", "month", "day", "hour"]
+
+# Date tokens, with the date granularity they depend on and how they are rendered
+DATE_TOKENS = {
+    "YYYY": ("year", lambda date: f"{date.year:04}"),
+    "YY": ("year", lambda date: f"{date.year % 100:02}"),
+    "MM": ("month", lambda date: f"{date.month:02}"),
+    "DD": ("day", lambda date: f"{date.day:02}"),
+    "DOY": ("day", lambda date: f"{date.timetuple().tm_yday:03}"),
+    "HH": ("hour", lambda date: f"{date.hour:02}"),
+}
+
+# Tokens filled from the station link
+STATION_TOKENS = {
+    "station": lambda station_link: station_link.station.name,
+}
+
+# Date directory layout used by station links structured by date without a path template
+LEGACY_DATE_SEGMENTS = ["{YYYY}", "{MM}", "{DD}", "{HH}"]
+
+
+def get_template_tokens(template):
+    """
+    Returns the tokens used in a path template.
+    
+    :param str template: The path template, e.g. ``/data/{station}/{YYYY}{MM}{DD}``.
+    :rtype: list[str]
+    """
+    return TOKEN_PATTERN.findall(template)
+
+
+def get_unknown_tokens(template):
+    return [token for token in get_template_tokens(template) if token not in DATE_TOKENS and token not in STATION_TOKENS]
+
+
+def has_date_tokens(template):
+    return any(token in DATE_TOKENS for token in get_template_tokens(template))
+
+
+def get_template_granularity(template):
+    """
+    Returns the finest date granularity used by a path template.
+    
+    :param str template: The path template.
+    :return: One of ``year``, ``month``, ``day`` or ``hour``, or None if the template
+        has no date token.
+    :rtype: str | None
+    """
+    granularities = [DATE_TOKENS[token][0] for token in get_template_tokens(template) if token in DATE_TOKENS]
+    
+    if not granularities:
+        return None
+    
+    return max(granularities, key=GRANULARITY_ORDER.index)
+
+
+def get_path_template(station_link):
+    """
+    Returns the path template of a station link. Station links structured by date with a
+    plain FTP path use the ``[YYYY]/[MM]/[DD]/[HH]`` layout, down to their date
+    granularity.
+    
+    :param FTPStationLink station_link: The station link.
+    :rtype: str
+    """
+    template = station_link.ftp_path
+    
+    if has_date_tokens(template) or not (station_link.dir_structured_by_date and station_link.date_granularity):
+        return template
+    
+    depth = GRANULARITY_ORDER.index(station_link.date_granularity) + 1
+    
+    return posixpath.join(template, *LEGACY_DATE_SEGMENTS[:depth])
+
+
+def render_path_template(template, station_link=None, date=None):
+    """
+    Fills the tokens of a path template.
+    
+    :param str template: The path template.
+    :param FTPStationLink station_link: The station link, for station tokens.
+    :param datetime date: The date, for date tokens.
+    :rtype: str
+    """
+    
+    def replace(match):
+        token = match.group(1)
+        
+        if token in DATE_TOKENS:
+            return DATE_TOKENS[token][1](date)
+        
+        if token in STATION_TOKENS:
+            return STATION_TOKENS[token](station_link)
+        
+        raise ValueError(f"Unknown path template token: {token}")
+    
+    return TOKEN_PATTERN.sub(replace, template)
+
+
+class PathTemplateCrawler:
+    """
+    Finds the existing directories matching a path template for a range of dates.
+    
+    The template is walked one segment at a time. Segments without date tokens are
+    followed without any request. For segments with date tokens, each parent directory
+    is listed once and only the children that render from a date in the range are kept,
+    so directories outside of the date range are never visited. Parent directories of a
+    segment are listed concurrently on up to ``workers`` FTP sessions.
+    
+    Above the last date segment, a parent with a single child in the range, like when
+    the dates of a realtime run share their year and month, is followed without listing
+    it, as the listing of the child at a deeper segment tells whether it exists. Probing
+    a single date then costs one listing, of the parent of its deepest date directory.
+    """
+    
+    def __init__(self, client, client_factory=None, workers=1):
+        self.client = client
+        self.pool = FTPClientPool(client_factory) if client_factory and workers > 1 else None
+        self.workers = workers
+    
+    def list_names(self, parent):
+        client = self.pool.get() if self.pool else self.client
+        return client.list_names(parent)
+    
+    def crawl(self, template, dates, station_link=None):
+        """
+        :param str template: The path template.
+        :param list[datetime] dates: The dates to find directories for.
+        :param FTPStationLink station_link: The station link, for station tokens.
+        :return: The existing directories, in date order.
+        :rtype: list[str]
+        """
+        absolute = template.startswith("/")
+        segments = [segment for segment in template.split("/") if segment]
+        
+        # rendered path of every date, as the list of its segments
+        date_paths = []
+        for date in dates:
+            rendered = [render_path_template(segment, station_link, date) for segment in segments]
+            if rendered not in date_paths:
+                date_paths.append(rendered)
+        
+        def join(parts):
+            path = "/".join(parts)
+            return "/" + path if absolute else path or "."
+        
+        date_depths = [depth for depth, segment in enumerate(segments) if has_date_tokens(segment)]
+        last_date_depth = date_depths[-1] if date_depths else -1
+        
+        frontier = {()}
+        
+        for depth, segment in enumerate(segments):
+            candidates = {tuple(parts[:depth + 1]) for parts in date_paths}
+            children = {candidate for candidate in candidates if candidate[:depth] in frontier}
+            parents = sorted({child[:depth] for child in children})
+            
+            # single children are checked by the listing of a deeper date segment
+            single_children = depth < last_date_depth and len(children) == len(parents)
+            
+            if has_date_tokens(segment) and not single_children:
+                names_by_parent = dict(zip(parents, self.map(self.list_names, [join(parent) for parent in parents])))
+                
+                # keep the children found in the listing, or all of them if the parent
+                # can not be listed
+                children = {child for child in children
+                            if names_by_parent[child[:depth]] is None or child[depth] in names_by_parent[child[:depth]]}
+            
+            frontier = children
+            
+            if not frontier:
+                break
+        
+        return [join(parts) for parts in date_paths if tuple(parts) in frontier]
+    
+    def map(self, func, items):
+        if not self.pool or len(items) <= 1:
+            return [func(item) for item in items]
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(func, items))
+    
+    def close(self):
+        if self.pool:
+            self.pool.close()
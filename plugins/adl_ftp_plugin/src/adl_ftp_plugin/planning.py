@@ -0,0 +1,131 @@
+import fnmatch
+import logging
+
+from django.utils import timezone as dj_timezone
+
+from .models import FTPStationDataFile
+from .path_templates import get_path_template, get_template_granularity, render_path_template
+from .utils import get_dates_to_now
+
+logger = logging.getLogger(__name__)
+
+
+class NetworkPlanner:
+    """
+    Reports the work a run of an FTP network would do, without downloading or writing
+    anything. Only directory listings are used, and each directory is listed once per
+    plan, so that station links sharing a directory do not list it again.
+    
+    Plans can use a start date or file pattern different from the saved ones, to size
+    a backfill or a pattern change before applying it.
+    """
+    
+    def __init__(self, collector):
+        """
+        :param NetworkCollector collector: The collector of the network, used for its
+            FTP sessions.
+        """
+        self.collector = collector
+        self.listings = {}
+    
+    def list_path(self, path):
+        if path not in self.listings:
+            self.listings[path] = self.collector.list_path(path)
+        return self.listings[path]
+    
+    def plan(self, station_links, start_date=None, file_pattern=None):
+        """
+        :param list[FTPStationLink] station_links: The station links to plan.
+        :param datetime start_date: Plan from this date instead of the start date of
+            each station link.
+        :param str file_pattern: Plan with this file pattern instead of the one of each
+            station link.
+        :return: The summary of the plan, serializable to JSON.
+        :rtype: dict
+        """
+        collector = self.collector
+        network_ftp = collector.network_ftp
+        
+        collector.ftp = collector.connect(network_ftp)
+        
+        try:
+            station_link_plans = [self.plan_station_link(station_link, start_date, file_pattern)
+                                  for station_link in station_links]
+        finally:
+            collector.ftp.close()
+        
+        totals = {}
+        for key in ("paths", "matching_files", "matching_bytes", "new_files", "new_bytes", "processed_files",
+                    "pending_files", "quarantined_files"):
+            totals[key] = sum(station_link_plan[key] for station_link_plan in station_link_plans)
+        
+        return {
+            "network_ftp_id": network_ftp.pk,
+            "network": network_ftp.network.name,
+            "planned_at": dj_timezone.now().isoformat(),
+            "listed_paths": len(self.listings),
+            "totals": totals,
+            "station_links": station_link_plans,
+        }
+    
+    def plan_station_link(self, station_link, start_date=None, file_pattern=None):
+        """
+        Plans the collection of one station link.
+        
+        :rtype: dict
+        """
+        pattern = file_pattern or station_link.file_pattern
+        template = get_path_template(station_link)
+        date_granularity = get_template_granularity(template)
+        
+        date_from = start_date or station_link.start_date
+        dates = []
+        
+        if date_granularity:
+            dates = get_dates_to_now(date_granularity, station_link.timezone, date_from)
+            paths = self.collector.find_date_paths(station_link, template, dates)
+        else:
+            path = render_path_template(template, station_link)
+            paths = [path] if self.collector.ftp.exists(path) else []
+        
+        matching_files = {}
+        for path in paths:
+            for file in self.list_path(path):
+                if fnmatch.fnmatch(file["name"], pattern):
+                    matching_files.setdefault(file["name"], file)
+        
+        # archives have one data file per member, processed once all of them are
+        data_files_by_name = {}
+        for file_name, processed, quarantined in FTPStationDataFile.objects.filter(
+                station_link=station_link, file_name__in=list(matching_files)
+        ).values_list("file_name", "processed", "quarantined"):
+            data_files_by_name.setdefault(file_name, []).append((processed, quarantined))
+        
+        new_files = [file for name, file in matching_files.items() if name not in data_files_by_name]
+        
+        states = {"processed": 0, "pending": 0, "quarantined": 0}
+        for data_files in data_files_by_name.values():
+            if all(quarantined for _, quarantined in data_files):
+                states["quarantined"] += 1
+            elif all(processed for processed, _ in data_files):
+                states["processed"] += 1
+            else:
+                states["pending"] += 1
+        
+        return {
+            "station_link_id": station_link.pk,
+            "station": station_link.station.name,
+            "path_template": template,
+            "file_pattern": pattern,
+            "date_granularity": date_granularity,
+            "date_from": dates[0].isoformat() if dates else None,
+            "date_count": len(dates),
+            "paths": len(paths),
+            "matching_files": len(matching_files),
+            "matching_bytes": sum(file.get("size") or 0 for file in matching_files.values()),
+            "new_files": len(new_files),
+            "new_bytes": sum(file.get("size") or 0 for file in new_files),
+            "processed_files": states["processed"],
+            "pending_files": states["pending"],
+            "quarantined_files": states["quarantined"],
+        }
@@ -1,19 +1,12 @@
-import fnmatch
 import logging
-import tempfile
+import threading
 
-from adl.core.models import ObservationRecord
 from adl.core.registries import Plugin
-from django.utils import timezone as dj_timezone
 
-from .ftp import FTPClient
-from .models import NetworkFTP, FTPStationDataFile
+from .collector import NetworkCollector
+from .models import NetworkFTP
+from .planning import NetworkPlanner
 from .registries import ftp_decoder_registry
-from .utils import (
-    normalize_path,
-    get_dates_to_now,
-    get_date_paths
-)
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +15,17 @@ class AdlFtpPlugin(Plugin):
     type = "adl_ftp_plugin"
     label = "ADL FTP Plugin"
     
-    network = None
-    decoder = None
-    ftp = None
-    variable_mappings = None
+    # the plugin is registered once and shared by all runs, so the network of a run is
+    # kept per thread
+    _local = threading.local()
+    
+    @property
+    def network(self):
+        return getattr(self._local, "network", None)
+    
+    @network.setter
+    def network(self, network):
+        self._local.network = network
     
     def get_urls(self):
         return []
@@ -41,174 +41,34 @@ class AdlFtpPlugin(Plugin):
     def get_data(self):
         if self.network:
             network_ftp = NetworkFTP.objects.filter(network=self.network).first()
-            decoder_name = network_ftp.decoder
-            decoder = self.get_decoder(decoder_name)
-            
-            if not decoder:
-                logger.error(f"[ADL_FTP_PLUGIN] Decoder {decoder_name} not found in decoder registry.")
-                return
-            
-            # found decoder
-            self.decoder = decoder
-            
-            variable_mappings = network_ftp.variable_mappings.all()
-            
-            if not variable_mappings:
-                logger.warning(
-                    f"[ADL_FTP_PLUGIN] No variable mappings found for network {network_ftp.network.name}. Skipping...")
-                return
-            
-            self.variable_mappings = variable_mappings
             
             if network_ftp:
-                logger.info(f"[ADL_FTP_PLUGIN] Getting data from FTP network {network_ftp.network.name}")
-                
-                # Create FTP client
-                self.ftp = FTPClient(host=network_ftp.host, port=network_ftp.port, user=network_ftp.username,
-                                     password=network_ftp.password)
-                
-                station_links = network_ftp.station_links.all()
-                
-                for station_link in station_links:
-                    self.process_station_link(station_link)
-                
-                # close the connection
-                self.ftp.close()
-    
-    def process_station_link(self, station_link):
-        logger.info(f"[ADL_FTP_PLUGIN] Getting data for station {station_link.station.name}")
-        timezone_info = station_link.timezone
-        
-        path = station_link.ftp_path
-        
-        # Add date info to path if structured by date
-        if station_link.dir_structured_by_date and station_link.date_granularity:
-            date_granularity = station_link.date_granularity
-            
-            if station_link.start_date:
-                dates = get_dates_to_now(date_granularity, timezone_info, station_link.start_date)
-            else:
-                dates = get_dates_to_now(date_granularity, timezone_info, dj_timezone.now())
-            
-            paths = get_date_paths(path, dates, date_granularity)
-        else:
-            paths = [path]
-        
-        # Process each path
-        for path in paths:
-            # check if the path exists
-            if not self.ftp.cd(path):
-                logger.warning(f"[ADL_FTP_PLUGIN] Path {path} not found")
-                continue
-            
-            self.process_path(station_link, path)
-    
-    def process_path(self, station_link, path):
-        station = station_link.station
-        
-        logger.info(f"[ADL_FTP_PLUGIN] Getting list of files in path {path}")
-        files = self.ftp.list(path, extra=True)
-        pattern = station_link.file_pattern
-        
-        # Filter files by pattern
-        matching_files = [file for file in files if fnmatch.fnmatch(file["name"], pattern)]
-        
-        # If no files found, log and continue
-        if not matching_files:
-            logger.info(f"[ADL_FTP_PLUGIN] No files found for station {station.name} matching "
-                        f"pattern {pattern} in path {path}")
-        else:
-            logger.info(
-                f"[ADL_FTP_PLUGIN] Found {len(matching_files)} matching files for station {station.name}")
-        
-        # Process each file
-        for file in matching_files:
-            file_name = file["name"]
-            
-            # Check if this file was already downloaded
-            db_data_file = FTPStationDataFile.objects.filter(station_link=station_link,
-                                                             file_name=file_name).first()
-            
-            if db_data_file and station_link.skip_already_downloaded_files:
-                logger.info(f"[ADL_FTP_PLUGIN] File {file_name} already downloaded")
-            
-            if not db_data_file or not station_link.skip_already_downloaded_files:
-                remote_file_path = normalize_path(f"{path}/{file_name}")
+                collector = NetworkCollector(network_ftp)
                 
-                with tempfile.NamedTemporaryFile(suffix=file_name) as temp_file:
-                    logger.info(f"[ADL_FTP_PLUGIN] Downloading file {file_name}..")
-                    self.ftp.get(remote_file_path, temp_file.name)
-                    
-                    db_data_file = FTPStationDataFile(
-                        station_link=station_link,  # Pass the appropriate FTPStationLink instance
-                        file_name=file_name,
-                    )
-                    
-                    db_data_file.file.save(file_name, temp_file)
-            
-            logger.info(f"[ADL_FTP_PLUGIN] Processing file {file_name}")
-            
-            if db_data_file.processed and station_link.skip_already_processed_files:
-                logger.info(f"[ADL_FTP_PLUGIN] File {file_name} already processed. Skipping..")
-                continue
-            
-            self.process_file(db_data_file, station_link, self.variable_mappings)
+                if collector.setup():
+                    collector.run()
     
-    def process_file(self, db_data_file, station_link, variable_mappings):
-        timezone_info = station_link.timezone
-        station = station_link.station
+    @staticmethod
+    def plan(network_ftp, station_link_ids=None, start_date=None, file_pattern=None):
+        """
+        Reports what a run of the network would collect, from directory listings only,
+        without downloading or ingesting anything.
         
-        data = self.decoder.decode(db_data_file.file.path)
-        data_values = data.get("values")
+        :param NetworkFTP network_ftp: The FTP network.
+        :param list[int] station_link_ids: Plan only these station links. Defaults to
+            all of them.
+        :param datetime start_date: Plan from this date instead of the start date of
+            each station link.
+        :param str file_pattern: Plan with this file pattern instead of the one of each
+            station link.
+        :return: The summary of the plan, serializable to JSON.
+        :rtype: dict
+        """
+        station_links = network_ftp.station_links.select_related("station")
         
-        record_count = len(data_values)
+        if station_link_ids:
+            station_links = station_links.filter(pk__in=station_link_ids)
         
-        file_obs_records = []
+        planner = NetworkPlanner(NetworkCollector(network_ftp))
         
-        for i, record in enumerate(data_values):
-            logger.info(f"[ADL_FTP_PLUGIN] Processing record {i + 1}/{record_count}")
-            
-            timestamp = record.get("TIMESTAMP")
-            
-            if not timestamp:
-                logger.warning(f"[ADL_FTP_PLUGIN] No timestamp found in record {record}")
-                continue
-            
-            utc_obs_date = dj_timezone.make_aware(timestamp, timezone_info)
-            
-            for variable_mapping in variable_mappings:
-                adl_parameter = variable_mapping.adl_parameter
-                file_variable_name = variable_mapping.file_variable_name
-                file_variable_units = variable_mapping.file_variable_units
-                
-                value = record.get(file_variable_name)
-                
-                if value is not None:
-                    try:
-                        value = adl_parameter.convert_value_units(value, file_variable_units)
-                        
-                        record_data = {
-                            "station": station,
-                            "parameter": adl_parameter,
-                            "time": utc_obs_date,
-                            "value": value,
-                            "connection": station_link.network_connection,
-                        }
-                        
-                        param_obs_record = ObservationRecord(**record_data)
-                        file_obs_records.append(param_obs_record)
-                    except Exception as e:
-                        logger.error(f"[ADL_FTP_PLUGIN] Error converting value for parameter "
-                                     f"{adl_parameter.parameter}: {e}")
-                else:
-                    logger.info(
-                        f"[ADL_FTP_PLUGIN] No data recorded for parameter {adl_parameter.parameter} ")
-        
-        if file_obs_records:
-            logger.info(
-                f"[ADL_FTP_PLUGIN] Saving {len(file_obs_records)} parameter records for station {station.name}")
-            ObservationRecord.objects.bulk_create(file_obs_records, ignore_conflicts=True)
-            
-            # Mark the db data file as processed
-            db_data_file.processed = True
-            db_data_file.save()
+        return planner.plan(list(station_links), start_date=start_date, file_pattern=file_pattern)
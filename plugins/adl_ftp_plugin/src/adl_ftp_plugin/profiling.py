@@ -0,0 +1,140 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import posixpath
+import pstats
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone as dj_timezone
+
+logger = logging.getLogger(__name__)
+
+# Storage directory the profiles are saved in
+PROFILES_DIR = "ftp_profiles"
+
+# Number of functions listed in the text report of a profile
+PROFILE_REPORT_LIMIT = 50
+
+
+class StageTimer:
+    """
+    Records the wall-clock time spent in each stage of a run. Time spent in a stage
+    nested in another one is only counted for the nested stage.
+    """
+    
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        # time spent in nested stages, for each open stage
+        self.nested = []
+    
+    @contextmanager
+    def stage(self, name):
+        started_at = time.perf_counter()
+        self.nested.append(0.0)
+        
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.durations[name] += elapsed - self.nested.pop()
+            self.counts[name] += 1
+            
+            if self.nested:
+                self.nested[-1] += elapsed
+    
+    def get_summary(self):
+        return {
+            name: {"seconds": round(duration, 6), "count": self.counts[name]}
+            for name, duration in sorted(self.durations.items(), key=lambda item: item[1], reverse=True)
+        }
+
+
+class RunProfiler:
+    """
+    Captures a cProfile profile and the stage breakdown of the run of one station link,
+    and saves them to storage as ``profile.prof``, a binary profile readable with
+    ``pstats`` or snakeviz, ``profile.txt``, the most expensive functions by cumulative
+    time, and ``summary.json``, the stage breakdown and the outcome of the run.
+    """
+    
+    def __init__(self, station_link):
+        self.station_link = station_link
+        self.stage_timer = StageTimer()
+        self.profile = cProfile.Profile()
+        self.started_at = None
+        self.start_time = None
+        self.duration = None
+    
+    def __enter__(self):
+        self.started_at = dj_timezone.now()
+        self.start_time = time.perf_counter()
+        
+        try:
+            self.profile.enable()
+        except ValueError as e:
+            # only one profiler can be active at a time, e.g. when networks are
+            # collected concurrently
+            logger.warning(f"[ADL_FTP_PLUGIN] Could not start the profiler, only stage timings are captured: {e}")
+            self.profile = None
+        
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profile:
+            self.profile.disable()
+        self.duration = time.perf_counter() - self.start_time
+    
+    def get_directory(self):
+        station_link = self.station_link
+        return posixpath.join(PROFILES_DIR, str(station_link.network_connection_id), str(station_link.station_id),
+                              self.started_at.strftime("%Y%m%dT%H%M%S"))
+    
+    def save(self, **summary):
+        """
+        Saves the profile and the summary of the run.
+        
+        :param summary: Outcome of the run, added to the summary.
+        :return: The storage path of the summary.
+        :rtype: str
+        """
+        directory = self.get_directory()
+        
+        if self.profile:
+            self.save_profile(directory)
+        
+        summary = {
+            "station_link_id": self.station_link.pk,
+            "station": self.station_link.station.name,
+            "started_at": self.started_at.isoformat(),
+            "duration": round(self.duration, 6),
+            "stages": self.stage_timer.get_summary(),
+            **summary,
+        }
+        
+        return default_storage.save(posixpath.join(directory, "summary.json"),
+                                    ContentFile(json.dumps(summary, indent=2).encode()))
+    
+    def save_profile(self, directory):
+        with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as temp_file:
+            profile_path = temp_file.name
+        
+        try:
+            self.profile.dump_stats(profile_path)
+            
+            with open(profile_path, "rb") as f:
+                default_storage.save(posixpath.join(directory, "profile.prof"), File(f))
+        finally:
+            os.remove(profile_path)
+        
+        report = io.StringIO()
+        pstats.Stats(self.profile, stream=report).sort_stats("cumulative").print_stats(PROFILE_REPORT_LIMIT)
+        default_storage.save(posixpath.join(directory, "profile.txt"), ContentFile(report.getvalue().encode()))
@@ -1,6 +1,58 @@
+import inspect
+import logging
+import posixpath
+import shutil
+import tempfile
+from contextlib import contextmanager
+from importlib.metadata import entry_points
+
 from django.core.exceptions import ImproperlyConfigured
 from adl.core.registry import Registry, Instance
 
+from .archives import detect_compression, open_data_file
+
+logger = logging.getLogger(__name__)
+
+# Entry point group third-party packages advertise their decoders in, by decoder type
+DECODER_ENTRY_POINT_GROUP = "adl_ftp_plugin.decoders"
+
+# Decoder choice for networks whose decoder is detected from the content of each file
+AUTO_DETECT_DECODER = "auto"
+
+# Number of rows per chunk when decoding files in chunks
+DECODE_CHUNK_SIZE = 10000
+
+
+class SkippedRows:
+    """
+    Counts the rows a decoder skipped because of the ``since`` cutoff, and the range
+    of their timestamps, so that the time range of a file is known even when only its
+    latest rows are decoded.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.first_time = None
+        self.last_time = None
+    
+    def add(self, timestamp):
+        self.count += 1
+        if self.first_time is None or timestamp < self.first_time:
+            self.first_time = timestamp
+        if self.last_time is None or timestamp > self.last_time:
+            self.last_time = timestamp
+    
+    def pop(self):
+        """
+        Returns the skipped rows as the ``skipped`` entry of a decode result, and starts
+        counting again.
+        
+        :rtype: dict
+        """
+        skipped = {"count": self.count, "first_time": self.first_time, "last_time": self.last_time}
+        self.__init__()
+        return skipped
+
 
 class FTPDecoder(Instance):
     """
@@ -18,22 +70,164 @@ class FTPDecoder(Instance):
     def pre_process(self, file_path):
         """
         This method is called before the decoding process.
-
+        
         :param file_path: The path to the file that should be decoded.
         :type file_path: str
         """
         return file_path
     
-    def decode(self, file_path):
+    @contextmanager
+    def open_file(self, file_path):
+        """
+        Opens the file to decode as a text stream. Compressed files are decompressed
+        on the fly. Already opened file objects are passed through as they are.
+        
+        :param file_path: The path to the file, or an open text file object.
+        :type file_path: str | typing.TextIO
+        """
+        if hasattr(file_path, "read"):
+            yield file_path
+        else:
+            with open_data_file(file_path) as f:
+                yield f
+    
+    def sniff(self, header_bytes):
+        """
+        Checks whether the given file header looks like a file this decoder can decode.
+        Used to detect the decoder of files when the network decoder is set to
+        auto-detect.
+        
+        :param header_bytes: The first bytes of the decompressed file content.
+        :type header_bytes: bytes
+        :return: True if the file can be decoded by this decoder.
+        :rtype: bool
+        """
+        return False
+    
+    def decode(self, file_path, tolerant=False, columns=None, since=None, compact=False):
         """
         Decodes the given file and returns the result.
-
-        :param file_path: The data that should be decoded.
-        :type file_path: str
+        
+        :param file_path: The path to the file, or an open text file object, that
+            should be decoded.
+        :type file_path: str | typing.TextIO
+        :param tolerant: If True, rows that can not be decoded are skipped and
+            recorded in the ``errors`` list of the result instead of raising.
+        :type tolerant: bool
+        :param columns: If provided, only these variables are parsed. Decoders should
+            skip converting other variables and leave them out of the result.
+        :type columns: set[str]
+        :param since: If provided, rows with a timestamp older than this naive station
+            local time are skipped while parsing. Decoders should report them in the
+            ``skipped`` entry of the result, a dict with their ``count`` and the
+            ``first_time`` and ``last_time`` of their timestamps, see ``SkippedRows``.
+        :type since: datetime
+        :param compact: If True, rows are returned as tuples ordered as the ``columns``
+            list of the result, instead of one dict per row.
+        :type compact: bool
         :return: The decoded data.
-        :rtype: list[dict]
+        :rtype: dict
         """
         raise NotImplementedError
+    
+    @classmethod
+    def supports_decode_options(cls):
+        """
+        Checks whether the ``decode`` method of the decoder accepts an open file object
+        and the ``tolerant``, ``columns``, ``since`` and ``compact`` options. Decoders
+        written for the original ``decode(file_path)`` contract are decoded with
+        ``decode_legacy`` instead.
+        
+        :rtype: bool
+        """
+        if "_supports_decode_options" not in cls.__dict__:
+            parameters = inspect.signature(cls.decode).parameters.values()
+            cls._supports_decode_options = any(
+                parameter.name == "compact" or parameter.kind == inspect.Parameter.VAR_KEYWORD
+                for parameter in parameters
+            )
+        
+        return cls._supports_decode_options
+    
+    def decode_legacy(self, file_path, member=None):
+        """
+        Decodes a file with a decoder written for the original ``decode(file_path)``
+        contract, and returns a compact decode result. These decoders expect the path of
+        a plain file, so compressed files and archive members are decompressed to a
+        temporary file first.
+        
+        :param file_path: The path to the stored file.
+        :type file_path: str
+        :param member: The zip archive member to decode.
+        :type member: str
+        :return: The decoded data, with its rows as tuples ordered as its ``columns``
+            list.
+        :rtype: dict
+        """
+        if member or detect_compression(file_path):
+            suffix = posixpath.basename(member or "")
+            
+            with tempfile.NamedTemporaryFile(suffix=suffix) as temp_file:
+                with open_data_file(file_path, member) as f:
+                    shutil.copyfileobj(f.buffer, temp_file)
+                temp_file.flush()
+                
+                data = self.decode(temp_file.name)
+        else:
+            data = self.decode(file_path)
+        
+        return to_compact_result(data)
+    
+    def iter_decode(self, file_path, tolerant=False, columns=None, since=None, chunk_size=DECODE_CHUNK_SIZE):
+        """
+        Decodes the given file in chunks of rows, so that large files do not have to be
+        held in memory at once. Each chunk is a compact decode result, with its rows as
+        tuples ordered as its ``columns`` list. The columns can differ between chunks.
+        
+        Decoders should override this to stream their files. By default, the whole
+        file is decoded as a single chunk.
+        
+        :param file_path: The path to the file, or an open text file object, that
+            should be decoded.
+        :type file_path: str | typing.TextIO
+        :param tolerant: See ``decode``.
+        :type tolerant: bool
+        :param columns: See ``decode``.
+        :type columns: set[str]
+        :param since: See ``decode``.
+        :type since: datetime
+        :param chunk_size: The maximum number of rows per chunk.
+        :type chunk_size: int
+        :return: The decoded chunks.
+        :rtype: collections.abc.Iterator[dict]
+        """
+        yield self.decode(file_path, tolerant=tolerant, columns=columns, since=since, compact=True)
+
+
+def to_compact_result(data):
+    """
+    Converts a decode result with one dict per row to a compact decode result, with
+    its rows as tuples ordered as its ``columns`` list. Compact results are returned
+    as they are.
+    
+    :param data: The decoded data, or the list of its rows.
+    :type data: dict | list[dict]
+    :rtype: dict
+    """
+    if isinstance(data, list):
+        data = {"values": data}
+    
+    if data.get("columns") is not None:
+        return data
+    
+    rows = data.get("values") or []
+    
+    columns = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    columns = list(columns)
+    
+    return {**data, "columns": columns, "values": [tuple(row.get(column) for column in columns) for row in rows]}
 
 
 class FTPDecoderRegistry(Registry):
@@ -42,6 +236,94 @@ class FTPDecoderRegistry(Registry):
     """
     
     name = "adl_ftp_decoder"
+    
+    def __init__(self):
+        super().__init__()
+        # incremented on every change, to invalidate the cached choices
+        self.version = 0
+        # decoders advertised through entry points, not imported yet
+        self.entry_points = {}
+        self._choices = None
+        self._choices_version = None
+    
+    def register(self, instance):
+        super().register(instance)
+        self.entry_points.pop(instance.type, None)
+        self.version += 1
+    
+    def discover_entry_points(self):
+        """
+        Records the decoders advertised by installed packages in the
+        ``adl_ftp_plugin.decoders`` entry point group, without importing them. Each
+        decoder is imported and registered the first time it is needed.
+        """
+        for entry_point in entry_points(group=DECODER_ENTRY_POINT_GROUP):
+            if entry_point.name not in self.registry:
+                self.entry_points[entry_point.name] = entry_point
+        
+        self.version += 1
+    
+    def load_entry_point(self, decoder_type):
+        """
+        Imports and registers the decoder advertised under the given type, if it is not
+        loaded yet.
+        
+        :param decoder_type: The decoder type, as named in the entry point.
+        :type decoder_type: str
+        """
+        entry_point = self.entry_points.pop(decoder_type, None)
+        
+        if entry_point is None:
+            return
+        
+        try:
+            decoder_class = entry_point.load()
+            self.register(decoder_class())
+        except Exception as e:
+            logger.error(f"[ADL_FTP_PLUGIN] Could not load decoder {decoder_type} from {entry_point.value}: {e}")
+            self.version += 1
+    
+    def load_entry_points(self):
+        for decoder_type in list(self.entry_points):
+            self.load_entry_point(decoder_type)
+    
+    def get(self, type_name):
+        self.load_entry_point(type_name)
+        return super().get(type_name)
+    
+    def get_choices(self):
+        """
+        Returns the decoder choices, cached until a decoder is registered. Decoders not
+        imported yet are listed by their type.
+        
+        :return: The decoder types and display names.
+        :rtype: list[tuple[str, str]]
+        """
+        if self._choices_version != self.version:
+            choices = [(decoder.type, decoder.display_name) for decoder in self.registry.values()]
+            choices += [(decoder_type, decoder_type) for decoder_type in self.entry_points]
+            
+            self._choices = choices
+            self._choices_version = self.version
+        
+        return list(self._choices)
+    
+    def detect(self, header_bytes):
+        """
+        Returns the first registered decoder that recognizes the given file header.
+        
+        :param header_bytes: The first bytes of the decompressed file content.
+        :type header_bytes: bytes
+        :return: The decoder, or None if no decoder recognizes the header.
+        :rtype: FTPDecoder | None
+        """
+        self.load_entry_points()
+        
+        for decoder in self.registry.values():
+            if decoder.sniff(header_bytes):
+                return decoder
+        
+        return None
 
 
 ftp_decoder_registry = FTPDecoderRegistry()
@@ -0,0 +1,173 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connections
+from django.db.models import Q
+
+from .dedupe import clear_observation_caches
+from .ingest import IngestBatch
+from .models import FTPStationDataFile, NetworkFTP
+
+logger = logging.getLogger(__name__)
+
+# Number of data files re-ingested by a worker process at a time
+REINGEST_CHUNK_SIZE = 200
+
+
+def get_reingest_data_files(network_ftp_ids=None, station_ids=None, date_from=None, date_to=None, decoder=None,
+                            include_quarantined=False):
+    """
+    Returns the stored data files to re-ingest. The date range is matched against the
+    observation times of the files, or their modification time on the FTP server for
+    files without any ingested observation. Files with neither, e.g. downloaded before
+    these were recorded, are left out when a date range is given, as their creation
+    time is the time they were migrated rather than downloaded.
+    
+    :param list[int] network_ftp_ids: Only files of these FTP networks.
+    :param list[int] station_ids: Only files of these stations.
+    :param datetime date_from: Only files with observations from this date.
+    :param datetime date_to: Only files with observations up to this date.
+    :param str decoder: Only files decoded with this decoder, set on the network or
+        detected.
+    :param bool include_quarantined: Also re-ingest quarantined files.
+    :rtype: django.db.models.QuerySet[FTPStationDataFile]
+    """
+    data_files = FTPStationDataFile.objects.exclude(file="")
+    
+    if network_ftp_ids:
+        data_files = data_files.filter(station_link__network_connection_id__in=network_ftp_ids)
+    
+    if station_ids:
+        data_files = data_files.filter(station_link__station_id__in=station_ids)
+    
+    if date_from:
+        data_files = data_files.filter(Q(last_observation_time__gte=date_from) |
+                                       Q(last_observation_time__isnull=True, remote_modified_at__gte=date_from))
+    
+    if date_to:
+        data_files = data_files.filter(Q(first_observation_time__lte=date_to) |
+                                       Q(first_observation_time__isnull=True, remote_modified_at__lte=date_to))
+    
+    if decoder:
+        network_ftp_ids = NetworkFTP.objects.filter(decoder=decoder).values_list("pk", flat=True)
+        data_files = data_files.filter(Q(station_link__network_connection_id__in=network_ftp_ids) |
+                                       Q(station_link__detected_decoder=decoder))
+    
+    if not include_quarantined:
+        data_files = data_files.filter(quarantined=False)
+    
+    # files of the same station link are re-ingested together
+    return data_files.order_by("station_link_id", "pk")
+
+
+def init_worker():
+    import django
+    from django.apps import apps
+    
+    # workers started with spawn or forkserver do not inherit the loaded apps
+    if not apps.ready:
+        django.setup()
+
+
+def reingest_data_files(data_file_ids, overwrite=False):
+    """
+    Decodes the given stored data files again and saves their observation records,
+    without contacting the FTP servers. The ingestion cutoff of the station links and
+    the observation cache are bypassed, so that every row of the files is written.
+    Records already saved are left as they are, unless ``overwrite`` is set.
+    
+    :param list[int] data_file_ids: The ids of the data files.
+    :param bool overwrite: Replace the value of the records already saved.
+    :return: The number of re-ingested files, of failed files and of ingested rows.
+    :rtype: dict[str, int]
+    """
+    from .collector import NetworkCollector
+    
+    result = {"files": 0, "failed": 0, "rows": 0}
+    collectors = {}
+    station_link_ids = set()
+    
+    data_files = FTPStationDataFile.objects.select_related("station_link", "station_link__station").filter(
+        pk__in=data_file_ids).order_by("station_link_id", "pk")
+    
+    try:
+        with IngestBatch() as batch:
+            for db_data_file in data_files:
+                station_link = db_data_file.station_link
+                network_ftp_id = station_link.network_connection_id
+                station_link_ids.add(station_link.pk)
+                
+                if network_ftp_id not in collectors:
+                    collector = NetworkCollector(NetworkFTP.objects.get(pk=network_ftp_id))
+                    collector.use_ingestion_cutoff = False
+                    collector.deduplicate_observations = False
+                    collector.overwrite_observations = overwrite
+                    collectors[network_ftp_id] = collector if collector.setup() else None
+                
+                collector = collectors[network_ftp_id]
+                
+                if collector is None:
+                    result["failed"] += 1
+                    continue
+                
+                db_data_file.processed = False
+                db_data_file.processing_attempts = 0
+                db_data_file.quarantined = False
+                
+                collector.process_file(db_data_file, station_link, collector.variable_mappings, batch)
+                
+                if db_data_file.processed:
+                    result["files"] += 1
+                    result["rows"] += db_data_file.rows_ingested
+                else:
+                    result["failed"] += 1
+    finally:
+        # the observations may have been deleted before re-ingesting the files
+        clear_observation_caches(station_link_ids=list(station_link_ids))
+        connections.close_all()
+    
+    return result
+
+
+def run_reingest(data_file_ids, workers=1, chunk_size=REINGEST_CHUNK_SIZE, overwrite=False, progress=None):
+    """
+    Re-ingests stored data files, decoding and writing them in parallel on ``workers``
+    processes, each working on chunks of ``chunk_size`` files.
+    
+    :param list[int] data_file_ids: The ids of the data files, ordered by station link.
+    :param int workers: The number of worker processes.
+    :param int chunk_size: The number of data files per chunk.
+    :param bool overwrite: Replace the value of the records already saved.
+    :param progress: Called after each chunk with the totals so far and the elapsed
+        seconds.
+    :type progress: typing.Callable[[dict[str, int], float], None]
+    :return: The number of re-ingested files, of failed files and of ingested rows.
+    :rtype: dict[str, int]
+    """
+    chunks = [data_file_ids[i:i + chunk_size] for i in range(0, len(data_file_ids), chunk_size)]
+    totals = {"files": 0, "failed": 0, "rows": 0}
+    started_at = time.monotonic()
+    
+    def add(result):
+        for key, value in result.items():
+            totals[key] += value
+        
+        if progress:
+            progress(totals, time.monotonic() - started_at)
+    
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            add(reingest_data_files(chunk, overwrite))
+        return totals
+    
+    # forked workers must not share the database connections of this process
+    connections.close_all()
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        futures = [executor.submit(reingest_data_files, chunk, overwrite) for chunk in chunks]
+        
+        for future in as_completed(futures):
+            add(future.result())
+    
+    return totals
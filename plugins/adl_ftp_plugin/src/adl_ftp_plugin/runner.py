@@ -0,0 +1,88 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections
+
+from .collector import NetworkCollector
+
+logger = logging.getLogger(__name__)
+
+# Number of networks collected at the same time
+DEFAULT_MAX_CONCURRENT_NETWORKS = 4
+
+
+def collect_network(network_ftp, max_sessions=None):
+    """
+    Collects one FTP network, in its own collector.
+    
+    :param NetworkFTP network_ftp: The FTP network.
+    :param int max_sessions: The maximum number of FTP sessions open at once by the run.
+    :return: True if the network was collected, False if it could not be set up.
+    :rtype: bool
+    """
+    try:
+        collector = NetworkCollector(network_ftp, max_sessions=max_sessions)
+        
+        if not collector.setup():
+            return False
+        
+        collector.run()
+        return True
+    finally:
+        # each thread has its own database connections
+        connections.close_all()
+
+
+def collect_networks(network_ftps, max_workers=None, max_sessions=None, max_db_connections=None):
+    """
+    Collects several FTP networks concurrently, within global limits shared by all of
+    them.
+    
+    Each network runs in a worker thread, using one database connection. The FTP session
+    budget is split evenly between the networks running at the same time, capping their
+    parallel downloads and listings.
+    
+    :param network_ftps: The FTP networks to collect.
+    :type network_ftps: iterable[NetworkFTP]
+    :param int max_workers: The maximum number of networks collected at the same time.
+    :param int max_sessions: The maximum number of FTP sessions open at once, across all
+        networks.
+    :param int max_db_connections: The maximum number of database connections used at
+        once.
+    :return: The error of each network that failed, by network id.
+    :rtype: dict[int, Exception]
+    """
+    network_ftps = list(network_ftps)
+    
+    if max_workers is None:
+        max_workers = getattr(settings, "ADL_FTP_MAX_CONCURRENT_NETWORKS", DEFAULT_MAX_CONCURRENT_NETWORKS)
+    if max_sessions is None:
+        max_sessions = getattr(settings, "ADL_FTP_MAX_SESSIONS", None)
+    if max_db_connections is None:
+        max_db_connections = getattr(settings, "ADL_FTP_MAX_DB_CONNECTIONS", None)
+    
+    limits = [limit for limit in (max_workers, max_sessions, max_db_connections, len(network_ftps)) if limit]
+    workers = max(min(limits, default=1), 1)
+    sessions_per_network = max_sessions // workers if max_sessions else None
+    
+    logger.info(f"[ADL_FTP_PLUGIN] Collecting {len(network_ftps)} networks, {workers} at a time")
+    
+    errors = {}
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(collect_network, network_ftp, sessions_per_network): network_ftp
+            for network_ftp in network_ftps
+        }
+        
+        for future in as_completed(futures):
+            network_ftp = futures[future]
+            
+            try:
+                future.result()
+            except Exception as e:
+                logger.exception(f"[ADL_FTP_PLUGIN] Error collecting network {network_ftp.network.name}: {e}")
+                errors[network_ftp.pk] = e
+    
+    return errors
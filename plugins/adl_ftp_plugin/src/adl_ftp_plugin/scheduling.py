@@ -0,0 +1,110 @@
+import logging
+from datetime import timedelta
+from statistics import median
+
+from django.db.models.functions import Coalesce
+from django.utils import timezone as dj_timezone
+
+logger = logging.getLogger(__name__)
+
+# Shortest delay between two polls of a station that is overdue
+MIN_POLL_INTERVAL = timedelta(minutes=5)
+
+# Longest delay between two polls of a silent station
+MAX_POLL_INTERVAL = timedelta(days=1)
+
+# Number of recent files used to learn the arrival interval of a station
+ARRIVAL_HISTORY_SIZE = 20
+
+
+def is_poll_due(station_link, now=None):
+    """
+    Checks whether the station link should be polled in this run.
+    
+    :param FTPStationLink station_link: The station link.
+    :param datetime now: The current time.
+    :rtype: bool
+    """
+    if not station_link.adaptive_polling or not station_link.next_poll_at:
+        return True
+    
+    now = now or dj_timezone.now()
+    
+    return now >= station_link.next_poll_at
+
+
+def get_arrival_times(station_link):
+    """
+    Returns the arrival times of the most recent files of the station link, oldest
+    first. The remote modification time is used when known, else the download time.
+    
+    :param FTPStationLink station_link: The station link.
+    :rtype: list[datetime]
+    """
+    arrival_times = station_link.data_files.annotate(
+        arrival_time=Coalesce("remote_modified_at", "created_at")
+    ).order_by("-arrival_time").values_list("arrival_time", flat=True).distinct()[:ARRIVAL_HISTORY_SIZE]
+    
+    return sorted(arrival_times)
+
+
+def learn_arrival_interval(arrival_times):
+    """
+    Returns the typical interval between file arrivals, as the median of the
+    intervals between consecutive arrival times.
+    
+    :param list[datetime] arrival_times: The arrival times, oldest first.
+    :return: The interval, or None if there is not enough history.
+    :rtype: timedelta | None
+    """
+    intervals = [(later - earlier).total_seconds() for earlier, later in zip(arrival_times, arrival_times[1:])]
+    intervals = [interval for interval in intervals if interval > 0]
+    
+    if not intervals:
+        return None
+    
+    return timedelta(seconds=median(intervals))
+
+
+def schedule_next_poll(station_link, new_files_count, now=None):
+    """
+    Sets when the station link should be polled next, from the arrival history of its
+    files.
+    
+    Stations are polled shortly before their next file is expected. Once a file is
+    overdue, the delay between polls doubles with every poll that finds no new file,
+    up to ``MAX_POLL_INTERVAL``.
+    
+    :param FTPStationLink station_link: The station link.
+    :param int new_files_count: The number of new files found by this poll.
+    :param datetime now: The current time.
+    """
+    now = now or dj_timezone.now()
+    
+    if new_files_count:
+        station_link.consecutive_empty_polls = 0
+    else:
+        station_link.consecutive_empty_polls += 1
+    
+    arrival_times = get_arrival_times(station_link)
+    arrival_interval = learn_arrival_interval(arrival_times)
+    
+    if arrival_interval:
+        station_link.arrival_interval = int(arrival_interval.total_seconds())
+    
+    next_poll_at = None
+    
+    if arrival_interval:
+        # poll a little ahead of the expected arrival, to account for jitter
+        expected_arrival = arrival_times[-1] + arrival_interval
+        next_poll_at = expected_arrival - arrival_interval / 10
+    
+    if next_poll_at is None or next_poll_at <= now:
+        backoff = MIN_POLL_INTERVAL * (2 ** min(station_link.consecutive_empty_polls, 16))
+        next_poll_at = now + min(backoff, MAX_POLL_INTERVAL)
+    
+    station_link.next_poll_at = min(next_poll_at, now + MAX_POLL_INTERVAL)
+    station_link.save(update_fields=["consecutive_empty_polls", "arrival_interval", "next_poll_at"])
+    
+    logger.info(f"[ADL_FTP_PLUGIN] Next poll for station {station_link.station.name} at "
+                f"{station_link.next_poll_at}")
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .dedupe import clear_observation_caches
+from .models import FTPStationLink
+
+
+@receiver(post_delete, sender=FTPStationLink)
+def forget_deleted_station_link(sender, instance, **kwargs):
+    clear_observation_caches(station_link_ids=[instance.pk])
@@ -0,0 +1,61 @@
+import pickle
+import tempfile
+
+
+class RecordSpool:
+    """
+    Buffers records in memory until they exceed ``max_size`` bytes, then spills them to
+    a temporary file on disk, so that the records of very large files do not have to be
+    held in memory while they are collected. Records are pickled in batches of
+    ``batch_size`` and read back in the order they were added.
+    """
+    
+    def __init__(self, max_size, batch_size=1000):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.batch_size = batch_size
+        self.batch = []
+        self.count = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def append(self, record):
+        self.batch.append(record)
+        self.count += 1
+        
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if self.batch:
+            pickle.dump(self.batch, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.batch = []
+    
+    @property
+    def spilled(self):
+        """ Whether the records were written to disk """
+        return getattr(self.file, "_rolled", False)
+    
+    def iter_batches(self):
+        """
+        Returns the spooled records, in batches of up to ``batch_size`` records.
+        
+        :rtype: collections.abc.Iterator[list]
+        """
+        self.flush()
+        self.file.seek(0)
+        
+        while True:
+            try:
+                yield pickle.load(self.file)
+            except EOFError:
+                return
+    
+    def close(self):
+        self.file.close()
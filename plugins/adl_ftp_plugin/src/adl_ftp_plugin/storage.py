@@ -0,0 +1,170 @@
+import bz2
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.utils import timezone as dj_timezone
+
+from .archives import detect_compression, open_binary_file
+from .models import FTPStationDataFile
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_OPENERS = {
+    "gzip": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+}
+
+# Only files smaller than this are packed into daily bundles
+BUNDLE_MAX_FILE_SIZE = 1024 * 1024
+
+
+def blob_is_shared_with(file_name, **filters):
+    """
+    Checks whether any data file matching the given filters references the stored blob.
+    Several data files can share a blob, for example members of the same archive.
+    """
+    return FTPStationDataFile.objects.filter(file=file_name, **filters).exists()
+
+
+def replace_blob(storage, old_name, new_name, **extra_fields):
+    """
+    Points all data files referencing ``old_name`` to ``new_name`` and deletes the old
+    blob.
+    """
+    FTPStationDataFile.objects.filter(file=old_name).update(file=new_name, **extra_fields)
+    storage.delete(old_name)
+
+
+def compress_data_file(db_data_file, compression):
+    """
+    Compresses the stored file of a data file in place. Files that are already
+    compressed, including archives, are left untouched.
+    
+    :param FTPStationDataFile db_data_file: The data file.
+    :param str compression: The compression to use, one of ``gzip`` or ``bz2``.
+    """
+    field_file = db_data_file.file
+    
+    if not compression or not field_file or detect_compression(field_file.path):
+        return
+    
+    opener, extension = COMPRESSION_OPENERS[compression]
+    storage = field_file.storage
+    old_name = field_file.name
+    
+    with tempfile.NamedTemporaryFile(suffix=extension) as temp_file:
+        with storage.open(old_name, "rb") as f_in, opener(temp_file.name, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        
+        new_name = storage.save(old_name + extension, File(temp_file))
+    
+    replace_blob(storage, old_name, new_name)
+    field_file.name = new_name
+    
+    logger.info(f"[ADL_FTP_PLUGIN] Compressed file {db_data_file.file_name} with {compression}")
+
+
+def bundle_daily_files(station_link):
+    """
+    Packs small processed files of previous days into one zip bundle per day, to
+    reduce the number of files kept on the media volume. The bundled data files
+    point to the bundle, with the member name in ``archive_member``.
+    
+    :param FTPStationLink station_link: The station link whose files to bundle.
+    """
+    start_of_today = dj_timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    candidates = FTPStationDataFile.objects.filter(
+        station_link=station_link,
+        processed=True,
+        archive_member__isnull=True,
+        created_at__lt=start_of_today,
+    ).exclude(file="").order_by("created_at")
+    
+    files_by_day = {}
+    for db_data_file in candidates:
+        day = dj_timezone.localtime(db_data_file.created_at).date()
+        files_by_day.setdefault(day, {}).setdefault(db_data_file.file.name, db_data_file)
+    
+    for day, blobs in files_by_day.items():
+        bundled = 0
+        
+        for file_name, db_data_file in blobs.items():
+            field_file = db_data_file.file
+            storage = field_file.storage
+            
+            if not storage.exists(file_name) or storage.size(file_name) > BUNDLE_MAX_FILE_SIZE:
+                continue
+            
+            if blob_is_shared_with(file_name, processed=False):
+                continue
+            
+            bundle_name = os.path.join(os.path.dirname(file_name), "bundles", f"{day.isoformat()}.zip")
+            member = f"{db_data_file.pk}-{os.path.basename(file_name)}"
+            
+            if not storage.exists(bundle_name):
+                with tempfile.NamedTemporaryFile(suffix=".zip") as temp_file:
+                    zipfile.ZipFile(temp_file.name, "w").close()
+                    bundle_name = storage.save(bundle_name, File(temp_file))
+            
+            # members are stored decompressed, the bundle itself is deflate compressed
+            with zipfile.ZipFile(storage.path(bundle_name), "a", compression=zipfile.ZIP_DEFLATED) as bundle:
+                with open_binary_file(field_file.path) as f_in, bundle.open(member, "w") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            
+            replace_blob(storage, file_name, bundle_name, archive_member=member)
+            bundled += 1
+        
+        if bundled:
+            logger.info(f"[ADL_FTP_PLUGIN] Bundled {bundled} files of {day} for station {station_link.station.name}")
+
+
+def expire_data_files(station_link, retention_days):
+    """
+    Deletes stored files older than the retention period. The data file rows are kept,
+    so that expired files are not downloaded again.
+    
+    :param FTPStationLink station_link: The station link whose files to expire.
+    :param int retention_days: Number of days to keep the stored files.
+    """
+    cutoff = dj_timezone.now() - timedelta(days=retention_days)
+    
+    file_names = list(FTPStationDataFile.objects.filter(
+        station_link=station_link,
+        created_at__lt=cutoff,
+    ).exclude(file="").values_list("file", flat=True).distinct())
+    
+    storage = FTPStationDataFile._meta.get_field("file").storage
+    expired = 0
+    
+    for file_name in file_names:
+        # keep blobs still referenced by recent data files
+        if blob_is_shared_with(file_name, created_at__gte=cutoff):
+            continue
+        
+        replace_blob(storage, file_name, "")
+        expired += 1
+    
+    if expired:
+        logger.info(f"[ADL_FTP_PLUGIN] Expired {expired} stored files for station {station_link.station.name}")
+
+
+def apply_storage_policy(network_ftp):
+    """
+    Applies the storage policy of the network to the stored files of all its station
+    links.
+    
+    :param NetworkFTP network_ftp: The FTP network.
+    """
+    for station_link in network_ftp.station_links.all():
+        if network_ftp.bundle_daily_files:
+            bundle_daily_files(station_link)
+        
+        if network_ftp.raw_file_retention_days:
+            expire_data_files(station_link, network_ftp.raw_file_retention_days)
@@ -0,0 +1,26 @@
+from celery import shared_task
+
+from .backfill import run_backfill
+from .models import NetworkFTP
+from .runner import collect_networks
+from .work_queue import run_work_queue
+
+
+@shared_task
+def run_station_link_backfill(station_link_id):
+    run_backfill(station_link_id)
+
+
+@shared_task
+def process_network_work_queue(network_ftp_id):
+    run_work_queue(network_ftp_id)
+
+
+@shared_task
+def collect_ftp_networks(network_ftp_ids=None):
+    network_ftps = NetworkFTP.objects.select_related("network")
+    
+    if network_ftp_ids:
+        network_ftps = network_ftps.filter(pk__in=network_ftp_ids)
+    
+    collect_networks(network_ftps)
@@ -1,9 +1,23 @@
+import fnmatch
+import hashlib
 import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
 
 from dateutil.relativedelta import relativedelta
+from django.db.models import UniqueConstraint
 from django.utils import timezone as dj_timezone
 
-from .registries import ftp_decoder_registry
+from django.utils.translation import gettext_lazy as _
+
+from .registries import ftp_decoder_registry, AUTO_DETECT_DECODER
 
 
 def get_ftp_decoder_choices():
@@ -14,11 +28,83 @@ def get_ftp_decoder_choices():
     :rtype: list[tuple[str, str]]
     """
     
-    choices = [(decoder.type, decoder.display_name) for decoder in ftp_decoder_registry.registry.values()]
+    choices = ftp_decoder_registry.get_choices()
+    choices.append((AUTO_DETECT_DECODER, _("Auto-detect")))
     
     return choices
 
 
+def get_mapping_plan_hash(variable_mappings):
+    """
+    Returns a hash identifying the variable mappings files are ingested with, so that
+    files ingested with different mappings can be told apart.
+    
+    :param variable_mappings: The variable mappings of the network.
+    :return: The SHA-256 hex digest.
+    :rtype: str
+    """
+    plan = sorted(
+        (variable_mapping.file_variable_name, variable_mapping.file_variable_units, variable_mapping.adl_parameter_id)
+        for variable_mapping in variable_mappings
+    )
+    
+    return hashlib.sha256(repr(plan).encode()).hexdigest()
+
+
+def get_observation_unique_fields():
+    """
+    Returns the fields of the unique constraint of observation records, that identify
+    the observation whose value is replaced when records are written over.
+    
+    :rtype: list[str]
+    """
+    from adl.core.models import ObservationRecord
+    
+    meta = ObservationRecord._meta
+    
+    for constraint in meta.constraints:
+        if isinstance(constraint, UniqueConstraint) and constraint.fields and constraint.condition is None:
+            return list(constraint.fields)
+    
+    if meta.unique_together:
+        return list(meta.unique_together[0])
+    
+    return ["time", "station", "connection", "parameter"]
+
+
+def get_peak_memory_usage():
+    """
+    Returns the peak resident memory of the current process, over its whole lifetime.
+    
+    :return: The peak memory in bytes, or None if it is not available on this platform.
+    :rtype: int | None
+    """
+    if resource is None:
+        return None
+    
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    # reported in bytes on macOS, in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def get_memory_usage():
+    """
+    Returns the current resident memory of the current process, read from
+    ``/proc/self/statm``.
+    
+    :return: The memory in bytes, or None if it is not available on this platform.
+    :rtype: int | None
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
 def normalize_path(path):
     """
     Normalizes the given path.
@@ -112,3 +198,90 @@ def get_date_paths(root_path, dates, date_granularity, ):
         paths.append(path)
     
     return paths
+
+
+class RateLimiter:
+    """
+    Token bucket limiting an operation to ``rate`` units per second on average, with
+    bursts of up to ``burst`` units. Consuming more units than are available blocks
+    until the bucket has refilled enough to cover them.
+    """
+    
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def consume(self, amount=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= amount
+            
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        
+        if wait:
+            time.sleep(wait)
+    
+    def throttle(self, factor, min_rate=None):
+        """
+        Lowers the rate, and the burst with it, by the given factor, down to
+        ``min_rate``.
+        
+        :param float factor: The factor, between 0 and 1.
+        :param float min_rate: The lowest rate.
+        """
+        with self.lock:
+            rate = self.rate * factor
+            if min_rate:
+                rate = max(rate, min_rate)
+            
+            self.capacity = self.capacity * rate / self.rate
+            self.tokens = min(self.tokens, self.capacity)
+            self.rate = rate
+
+
+class FilePatternIndex:
+    """
+    Matches file names against many file patterns at once. Patterns are indexed by their
+    literal prefix, the part before the first wildcard, so that a file name is only
+    matched against the patterns whose prefix it starts with.
+    """
+    
+    WILDCARDS = "*?["
+    
+    def __init__(self, entries=()):
+        # prefix length -> prefix -> list of (pattern, value)
+        self.patterns_by_prefix = {}
+        
+        for pattern, value in entries:
+            self.add(pattern, value)
+    
+    def add(self, pattern, value):
+        prefix_length = len(pattern)
+        for i, char in enumerate(pattern):
+            if char in self.WILDCARDS:
+                prefix_length = i
+                break
+        
+        prefixes = self.patterns_by_prefix.setdefault(prefix_length, {})
+        prefixes.setdefault(pattern[:prefix_length], []).append((pattern, value))
+    
+    def match(self, name):
+        """
+        Returns the values of all the patterns matching the file name.
+        
+        :param str name: The file name.
+        :rtype: list
+        """
+        matches = []
+        
+        for prefix_length, prefixes in self.patterns_by_prefix.items():
+            for pattern, value in prefixes.get(name[:prefix_length], ()):
+                if fnmatch.fnmatch(name, pattern):
+                    matches.append(value)
+        
+        return matches
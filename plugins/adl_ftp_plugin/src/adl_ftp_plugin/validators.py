@@ -17,3 +17,23 @@ def validate_start_date(value: datetime.datetime):
     """
     if value is not None and value > timezone.now():
         raise ValidationError(_("Start date should be in the past"))
+
+
+def validate_ftp_path_template(value: str):
+    """
+    Validate the tokens used in an FTP path template.
+
+    :param str value: The FTP path, optionally with tokens like {YYYY} or {station}.
+    :return: None
+    :raises: ValidationError
+    """
+    from .path_templates import get_unknown_tokens, DATE_TOKENS, STATION_TOKENS
+
+    unknown_tokens = get_unknown_tokens(value)
+
+    if unknown_tokens:
+        supported = ", ".join(f"{{{token}}}" for token in list(DATE_TOKENS) + list(STATION_TOKENS))
+        raise ValidationError(
+            _("Unknown path tokens: %(tokens)s. Supported tokens are %(supported)s"),
+            params={"tokens": ", ".join(unknown_tokens), "supported": supported},
+        )
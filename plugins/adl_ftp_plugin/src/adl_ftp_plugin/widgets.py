@@ -7,8 +7,6 @@ class FTPDecoderSelectWidget(widgets.Select):
     def __init__(self, attrs=None, choices=()):
         blank_choice = [("", "---------")]
         
-        decoder_choices = [(decoder.type, decoder.display_name) for decoder in ftp_decoder_registry.registry.values()]
-        
-        print(decoder_choices)
+        decoder_choices = ftp_decoder_registry.get_choices()
         
         super().__init__(attrs, blank_choice + decoder_choices)
@@ -0,0 +1,144 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone as dj_timezone
+
+from .models import NetworkFTP, FTPWorkItem
+
+logger = logging.getLogger(__name__)
+
+# Items claimed by a worker that stopped without finishing them are claimed again
+# after this delay
+WORK_ITEM_LOCK_TIMEOUT = timedelta(minutes=30)
+
+# Delay before the first retry of a failed item, doubled with every attempt
+WORK_ITEM_RETRY_DELAY = timedelta(minutes=5)
+
+# Done items are deleted once they have been available for this long
+DONE_WORK_ITEM_RETENTION = timedelta(days=7)
+
+
+def enqueue_data_files(db_data_files, priority=FTPWorkItem.PRIORITY_REALTIME):
+    """
+    Queues the given data files for processing. Files already pending or being processed
+    are left as they are, so that their retry delay, priority and claim are kept. Files
+    whose item is done or failed are made pending again.
+    
+    :param list[FTPStationDataFile] db_data_files: The data files to process.
+    :param int priority: The priority of the new items.
+    """
+    if not db_data_files:
+        return
+    
+    now = dj_timezone.now()
+    
+    work_items = [
+        FTPWorkItem(station_link_id=db_data_file.station_link_id, data_file=db_data_file, priority=priority,
+                    state=FTPWorkItem.STATE_PENDING, available_at=now)
+        for db_data_file in db_data_files
+    ]
+    
+    FTPWorkItem.objects.bulk_create(work_items, ignore_conflicts=True)
+    
+    FTPWorkItem.objects.filter(
+        data_file__in=db_data_files, state__in=[FTPWorkItem.STATE_DONE, FTPWorkItem.STATE_FAILED]
+    ).update(state=FTPWorkItem.STATE_PENDING, priority=priority, available_at=now, locked_at=None)
+
+
+def claim_work_items(limit, **filters):
+    """
+    Claims the next available items of the queue, highest priority first. Rows are
+    locked with ``SKIP LOCKED`` while they are claimed, so that concurrent workers
+    claim different items.
+    
+    :param int limit: The maximum number of items to claim.
+    :param filters: Filters on the items, e.g. ``station_link=...``.
+    :return: The claimed items, with their data file and station link.
+    :rtype: list[FTPWorkItem]
+    """
+    now = dj_timezone.now()
+    
+    available = Q(state=FTPWorkItem.STATE_PENDING, available_at__lte=now) | Q(
+        state=FTPWorkItem.STATE_PROCESSING, locked_at__lt=now - WORK_ITEM_LOCK_TIMEOUT
+    )
+    
+    with transaction.atomic():
+        work_items = list(
+            FTPWorkItem.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("data_file", "station_link")
+            .filter(available, **filters)
+            .order_by("-priority", "available_at")[:limit]
+        )
+        
+        for work_item in work_items:
+            work_item.state = FTPWorkItem.STATE_PROCESSING
+            work_item.locked_at = now
+            work_item.attempts += 1
+        
+        FTPWorkItem.objects.bulk_update(work_items, ["state", "locked_at", "attempts"])
+    
+    return work_items
+
+
+def finish_work_item(work_item, db_data_file):
+    """
+    Sets the state of a claimed item from the outcome of processing its data file.
+    Failed files are retried with an exponential backoff, until they are quarantined.
+    
+    :param FTPWorkItem work_item: The claimed item.
+    :param FTPStationDataFile db_data_file: The processed data file.
+    """
+    work_item.locked_at = None
+    
+    if db_data_file.quarantined:
+        work_item.state = FTPWorkItem.STATE_FAILED
+        work_item.last_error = db_data_file.error_sample
+    elif db_data_file.processed or not db_data_file.file:
+        work_item.state = FTPWorkItem.STATE_DONE
+    else:
+        work_item.state = FTPWorkItem.STATE_PENDING
+        work_item.last_error = db_data_file.error_sample
+        work_item.available_at = dj_timezone.now() + WORK_ITEM_RETRY_DELAY * (2 ** min(work_item.attempts - 1, 10))
+        
+        logger.info(f"[ADL_FTP_PLUGIN] File {db_data_file} will be retried at {work_item.available_at}")
+
+
+def prune_work_items(network_ftp_id):
+    """
+    Deletes the done items of a network older than ``DONE_WORK_ITEM_RETENTION``, so that
+    the queue only grows with the pending and failed items. Files queued again get a
+    new item.
+    
+    :param int network_ftp_id: The id of the FTP network.
+    """
+    deleted_count, _ = FTPWorkItem.objects.filter(
+        station_link__network_connection_id=network_ftp_id, state=FTPWorkItem.STATE_DONE,
+        available_at__lt=dj_timezone.now() - DONE_WORK_ITEM_RETENTION,
+    ).delete()
+    
+    if deleted_count:
+        logger.info(f"[ADL_FTP_PLUGIN] Deleted {deleted_count} done work items")
+
+
+def run_work_queue(network_ftp_id):
+    """
+    Processes the queued data files of a network. Processing does not need the FTP
+    server, so it can run on workers separate from the ones collecting files.
+    
+    :param int network_ftp_id: The id of the FTP network.
+    """
+    from .collector import NetworkCollector
+    
+    network_ftp = NetworkFTP.objects.get(pk=network_ftp_id)
+    
+    collector = NetworkCollector(network_ftp)
+    if not collector.setup():
+        return
+    
+    processed_count = collector.process_work_queue()
+    
+    logger.info(f"[ADL_FTP_PLUGIN] Processed {processed_count} queued files of network {network_ftp.network.name}")
+    
+    prune_work_items(network_ftp_id)
@@ -0,0 +1,41 @@
+import io
+from datetime import datetime
+
+from adl_ftp_plugin.decoders import SiapMicrosDecoder, Toa5Decoder
+
+TOA5_FILE = """"TOA5","Station","CR1000","1234","CR1000.Std.32","CPU:station.CR1","1234","Hourly"
+"TIMESTAMP","RECORD","AirT","RH"
+"TS","RN","C","%"
+"","","Smp","Smp"
+"2024-01-01 00:00:00",1,1.5,80
+"2024-01-01 01:00:00",2,2.0,81
+"2024-01-01 02:00:00",3,2.5,82
+"""
+
+SIAP_FILE = ("S1,x,10.00.00,01,02,2024,y,M2,1,A,12.5,2,B,80,#15\n"
+             "S1,x,11.00.00,01,02,2024,y,M2,1,A,13.5,2,B,81,#15\n")
+
+
+def test_toa5_reports_the_rows_skipped_by_the_cutoff():
+    data = Toa5Decoder().decode(io.StringIO(TOA5_FILE), columns={"TIMESTAMP", "AirT"},
+                                since=datetime(2024, 1, 1, 1, 30), compact=True)
+    
+    assert data["values"] == [(datetime(2024, 1, 1, 2), 2.5)]
+    assert data["skipped"] == {"count": 2, "first_time": datetime(2024, 1, 1, 0), "last_time": datetime(2024, 1, 1, 1)}
+
+
+def test_toa5_chunks_report_fully_skipped_files():
+    chunks = list(Toa5Decoder().iter_decode(io.StringIO(TOA5_FILE), columns={"TIMESTAMP", "AirT"},
+                                            since=datetime(2025, 1, 1)))
+    
+    assert [chunk["values"] for chunk in chunks] == [[]]
+    assert chunks[0]["skipped"]["count"] == 3
+
+
+def test_siapmicros_reports_the_rows_skipped_by_the_cutoff():
+    data = SiapMicrosDecoder().decode(io.StringIO(SIAP_FILE), columns={"1"}, since=datetime(2024, 2, 1, 10, 30),
+                                      compact=True)
+    
+    assert data["values"] == [("S1", datetime(2024, 2, 1, 11), 13.5)]
+    assert data["skipped"] == {"count": 1, "first_time": datetime(2024, 2, 1, 10),
+                               "last_time": datetime(2024, 2, 1, 10)}
@@ -0,0 +1,34 @@
+from adl_ftp_plugin.decoders import SiapMicrosDecoder, Toa5Decoder
+
+TOA5_HEADER = (b'"TOA5","Station","CR1000","1234","CR1000.Std.32","CPU:station.CR1","1234","Hourly"\r\n'
+               b'"TIMESTAMP","RECORD","AirT","RH"\r\n')
+
+SIAP_LINE = b"S1,x,10.00.00,01,02,2024,y,M2,1,A,12.5,2,B,80,#15"
+
+
+def test_toa5_sniff():
+    decoder = Toa5Decoder()
+    
+    assert decoder.sniff(TOA5_HEADER)
+    assert decoder.sniff(b"\xef\xbb\xbf" + TOA5_HEADER)
+    assert decoder.sniff(b"TOA5,Station,CR1000\n")
+    assert not decoder.sniff(SIAP_LINE + b"\n")
+
+
+def test_siapmicros_sniff():
+    decoder = SiapMicrosDecoder()
+    
+    assert decoder.sniff(SIAP_LINE + b"\n" + SIAP_LINE[:20])
+    assert decoder.sniff(SIAP_LINE)
+    assert not decoder.sniff(b"S1,x,10.00.00,01,02,2024,y,M2,1,A,12.5,2,B,80,#14\n")
+    assert not decoder.sniff(TOA5_HEADER)
+
+
+def test_siapmicros_sniff_line_longer_than_header():
+    decoder = SiapMicrosDecoder()
+    blocks = b",".join(b"%d,A,12.5" % i for i in range(1, 60))
+    line = b"S1,x,10.00.00,01,02,2024,y,M59," + blocks + b",#186\n"
+    
+    assert decoder.sniff(line)
+    assert decoder.sniff(line[:512])
+    assert not decoder.sniff(TOA5_HEADER * 10)
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from adl_ftp_plugin import dedupe
+from adl_ftp_plugin.dedupe import (
+    ObservationKeyCache,
+    clear_observation_caches,
+    get_observation_cache
+)
+
+
+@pytest.fixture
+def caches():
+    settings = SimpleNamespace(ADL_FTP_OBSERVATION_CACHE_TTL=60, ADL_FTP_OBSERVATION_CACHE_MAX_KEYS=10)
+    
+    with mock.patch.object(dedupe, "settings", settings), mock.patch.object(ObservationKeyCache, "warm"):
+        clear_observation_caches()
+        yield dedupe._caches
+        clear_observation_caches()
+
+
+def make_station_link(pk, station_id=None):
+    return SimpleNamespace(pk=pk, station_id=station_id or pk)
+
+
+def test_cache_evicts_least_recently_used_keys():
+    cache = ObservationKeyCache(2)
+    cache.add_many([(1, 1, "a"), (1, 1, "b")])
+    
+    assert (1, 1, "a") in cache
+    cache.add_many([(1, 1, "c")])
+    
+    assert (1, 1, "a") in cache
+    assert (1, 1, "b") not in cache
+    assert (1, 1, "c") in cache
+
+
+def test_cache_filters_saved_and_repeated_keys():
+    cache = ObservationKeyCache(10)
+    cache.add_many([(1, 1, "a")])
+    
+    obs_values = [(1, 1, "a", 1.0, 1), (1, 1, "b", 2.0, 1), (1, 1, "b", 3.0, 1)]
+    
+    assert cache.filter_new(obs_values) == [(1, 1, "b", 2.0, 1)]
+
+
+def test_cache_is_shared_and_recreated_after_ttl(caches):
+    station_link = make_station_link(1)
+    
+    with mock.patch("adl_ftp_plugin.dedupe.time.monotonic", return_value=1000):
+        cache = get_observation_cache(station_link, 5)
+        assert get_observation_cache(station_link, 5) is cache
+    
+    with mock.patch("adl_ftp_plugin.dedupe.time.monotonic", return_value=1061):
+        assert get_observation_cache(station_link, 5) is not cache
+
+
+def test_cache_size_is_bounded_by_the_global_cap(caches):
+    assert get_observation_cache(make_station_link(1), 50).max_size == 10
+
+
+def test_least_recently_used_caches_are_dropped_past_the_global_cap(caches):
+    first = get_observation_cache(make_station_link(1), 10)
+    first.add_many([(1, 1, i) for i in range(6)])
+    second = get_observation_cache(make_station_link(2), 10)
+    second.add_many([(2, 1, i) for i in range(6)])
+    
+    get_observation_cache(make_station_link(3), 10)
+    
+    assert list(caches) == [2, 3]
+
+
+def test_clear_observation_caches_by_station(caches):
+    get_observation_cache(make_station_link(1, station_id=10), 5)
+    get_observation_cache(make_station_link(2, station_id=20), 5)
+    
+    clear_observation_caches(station_ids=[10])
+    assert list(caches) == [2]
+    
+    clear_observation_caches(station_link_ids=[2])
+    assert list(caches) == []
@@ -0,0 +1,58 @@
+from ftplib import error_temp
+from unittest import mock
+
+import pytest
+
+from adl_ftp_plugin.ftp import FTPClient
+from adl_ftp_plugin.utils import RateLimiter
+
+
+@pytest.fixture
+def sleep():
+    with mock.patch("adl_ftp_plugin.ftp.time.sleep") as sleep:
+        yield sleep
+
+
+@pytest.fixture
+def client(sleep):
+    with mock.patch("adl_ftp_plugin.ftp.FTP"):
+        yield FTPClient(host="ftp.example.org", port=21, user="user", password="password")
+
+
+def test_list_names_of_empty_directory_answered_with_450(client, sleep):
+    client.conn.nlst.side_effect = error_temp("450 No files found")
+    
+    assert client.list_names("/data/2024/01/01") == set()
+    client.conn.nlst.assert_called_once_with("/data/2024/01/01")
+    sleep.assert_not_called()
+
+
+def test_exists_in_empty_directory_answered_with_450(client):
+    client.conn.nlst.side_effect = error_temp("450 No files found")
+    
+    assert client.exists("/data/2024/01/01/00") is False
+
+
+def test_list_names_strips_parent_paths(client):
+    client.conn.nlst.return_value = ["/data/2024/", "/data/2025"]
+    
+    assert client.list_names("/data") == {"2024", "2025"}
+
+
+def test_permanent_reply_for_the_command_is_not_retried(client, sleep):
+    client.conn.retrbinary.side_effect = error_temp("450 File busy")
+    
+    with pytest.raises(error_temp):
+        client.get("/data/file.dat")
+    
+    client.conn.retrbinary.assert_called_once()
+    sleep.assert_not_called()
+
+
+def test_transient_reply_is_retried_and_slows_commands_down(client, sleep):
+    client.command_rate_limiter = RateLimiter(10)
+    client.conn.pwd.side_effect = [error_temp("425 Can't open data connection"), "/data"]
+    
+    assert client.pwd() == "/data"
+    assert sleep.call_count == 1
+    assert client.command_rate_limiter.rate == 5
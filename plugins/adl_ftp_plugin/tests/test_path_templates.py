@@ -0,0 +1,101 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from adl_ftp_plugin.path_templates import (
+    PathTemplateCrawler,
+    get_path_template,
+    get_template_granularity,
+    render_path_template
+)
+
+LEGACY_TEMPLATE = "/data/{YYYY}/{MM}/{DD}/{HH}"
+
+
+class FakeFTPClient:
+    """ Lists the directories of a fake server, recording the listed paths """
+    
+    def __init__(self, paths):
+        self.tree = {}
+        self.listed = []
+        
+        for path in paths:
+            parts = path.strip("/").split("/")
+            for depth in range(len(parts)):
+                parent = "/" + "/".join(parts[:depth])
+                self.tree.setdefault(parent, set()).add(parts[depth])
+    
+    def list_names(self, remote):
+        self.listed.append(remote)
+        return self.tree.get(remote, set())
+
+
+def test_crawl_single_date_lists_only_the_parent_of_the_leaf():
+    client = FakeFTPClient(["/data/2024/10/19/10"])
+    
+    paths = PathTemplateCrawler(client).crawl(LEGACY_TEMPLATE, [datetime(2024, 10, 19, 10)])
+    
+    assert paths == ["/data/2024/10/19/10"]
+    assert client.listed == ["/data/2024/10/19"]
+
+
+def test_crawl_single_missing_date():
+    client = FakeFTPClient(["/data/2024/10/18/10"])
+    
+    assert PathTemplateCrawler(client).crawl(LEGACY_TEMPLATE, [datetime(2024, 10, 19, 10)]) == []
+    assert client.listed == ["/data/2024/10/19"]
+
+
+def test_crawl_dates_across_a_day_boundary():
+    client = FakeFTPClient(["/data/2024/10/18/23", "/data/2024/10/19/00"])
+    dates = [datetime(2024, 10, 18, 23), datetime(2024, 10, 19, 0)]
+    
+    paths = PathTemplateCrawler(client).crawl(LEGACY_TEMPLATE, dates)
+    
+    assert paths == ["/data/2024/10/18/23", "/data/2024/10/19/00"]
+    assert client.listed == ["/data/2024/10", "/data/2024/10/18", "/data/2024/10/19"]
+
+
+def test_render_path_template():
+    station_link = SimpleNamespace(station=SimpleNamespace(name="ST01"))
+    
+    path = render_path_template("/data/{station}/{YYYY}{MM}{DD}/{DOY}/{HH}", station_link, datetime(2024, 2, 3, 4))
+    
+    assert path == "/data/ST01/20240203/034/04"
+
+
+def test_render_path_template_with_unknown_token():
+    with pytest.raises(ValueError):
+        render_path_template("/data/{site}", date=datetime(2024, 2, 3))
+
+
+def test_template_granularity():
+    assert get_template_granularity("/data/{YYYY}/{DOY}") == "day"
+    assert get_template_granularity("/data/{station}") is None
+
+
+def test_legacy_path_template():
+    station_link = SimpleNamespace(ftp_path="/data", dir_structured_by_date=True, date_granularity="day")
+    
+    assert get_path_template(station_link) == "/data/{YYYY}/{MM}/{DD}"
+
+
+def test_crawl_prunes_directories_outside_the_date_range():
+    client = FakeFTPClient(["/data/ST01/20240101", "/data/ST01/20240102", "/data/ST01/20240103",
+                            "/data/ST02/20240102"])
+    station_link = SimpleNamespace(station=SimpleNamespace(name="ST01"))
+    dates = [datetime(2024, 1, 2), datetime(2024, 1, 3), datetime(2024, 1, 4)]
+    
+    paths = PathTemplateCrawler(client).crawl("/data/{station}/{YYYY}{MM}{DD}", dates, station_link)
+    
+    assert paths == ["/data/ST01/20240102", "/data/ST01/20240103"]
+    assert client.listed == ["/data/ST01"]
+
+
+def test_crawl_stops_at_missing_parents():
+    client = FakeFTPClient(["/data/2023/12/31"])
+    dates = [datetime(2024, 1, 31), datetime(2024, 2, 1)]
+    
+    assert PathTemplateCrawler(client).crawl("/data/{YYYY}/{MM}/{DD}", dates) == []
+    assert client.listed == ["/data/2024"]
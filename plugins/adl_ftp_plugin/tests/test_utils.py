@@ -0,0 +1,49 @@
+from unittest import mock
+
+from adl_ftp_plugin.utils import FilePatternIndex, RateLimiter
+
+
+def test_file_pattern_index_matches_all_patterns():
+    index = FilePatternIndex([("ST01_*.dat", 1), ("ST01_*.csv", 2), ("ST02_*", 3), ("*.dat", 4), ("ST01_a.dat", 5)])
+    
+    assert sorted(index.match("ST01_a.dat")) == [1, 4, 5]
+    assert index.match("ST02_b.csv") == [3]
+    assert index.match("other.txt") == []
+
+
+def test_file_pattern_index_with_character_classes():
+    index = FilePatternIndex([("ST0[12]_*.dat", "station"), ("?T01_*.dat", "any")])
+    
+    assert sorted(index.match("ST01_a.dat")) == ["any", "station"]
+    assert index.match("ST03_a.dat") == []
+
+
+def test_rate_limiter_allows_bursts_then_waits():
+    now = [100.0]
+    
+    with mock.patch("adl_ftp_plugin.utils.time.monotonic", lambda: now[0]), \
+            mock.patch("adl_ftp_plugin.utils.time.sleep") as sleep:
+        limiter = RateLimiter(10, burst=20)
+        
+        limiter.consume(20)
+        sleep.assert_not_called()
+        
+        limiter.consume(5)
+        sleep.assert_called_once_with(0.5)
+        
+        # the bucket refills at the rate
+        now[0] += 2.5
+        sleep.reset_mock()
+        limiter.consume(20)
+        sleep.assert_not_called()
+
+
+def test_rate_limiter_throttle():
+    limiter = RateLimiter(8, burst=16)
+    
+    limiter.throttle(0.5)
+    assert (limiter.rate, limiter.capacity) == (4, 8)
+    assert limiter.tokens <= 8
+    
+    limiter.throttle(0.1, min_rate=1)
+    assert (limiter.rate, limiter.capacity) == (1, 2)